@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+FashionXG Throughput Autotuner
+Hill-climbs the bridge pipeline parameters (download parallelism, in-flight
+ComfyUI prompts, upload parallelism, inter-image delay) over short probe
+windows to maximise images/s, optionally under a latency bound
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_CONFIG_FILE = "pipeline_config.json"
+
+
+class PipelineConfig:
+    """Concurrency knobs for FashionXGBridge.process_images"""
+
+    # name -> ordered candidate values the tuner moves between
+    SEARCH_SPACE = {
+        "download_workers": [1, 2, 4, 8, 16],
+        "inflight_prompts": [1, 2, 3, 4, 6, 8],
+        "upload_workers": [1, 2, 4, 8],
+        "image_delay": [1.0, 0.5, 0.25, 0.0],
+    }
+
+    def __init__(self, download_workers: int = 1, inflight_prompts: int = 1,
+                 upload_workers: int = 1, image_delay: float = 1.0):
+        self.download_workers = download_workers
+        self.inflight_prompts = inflight_prompts
+        self.upload_workers = upload_workers
+        self.image_delay = image_delay
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.SEARCH_SPACE}
+
+    def copy(self, **changes) -> "PipelineConfig":
+        return PipelineConfig(**{**self.to_dict(), **changes})
+
+    def __repr__(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.to_dict().items())
+
+    @classmethod
+    def load(cls, path: str = PIPELINE_CONFIG_FILE) -> "PipelineConfig":
+        """Load a tuned configuration, falling back to the sequential defaults"""
+        if not Path(path).exists():
+            return cls()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(**{name: data[name] for name in cls.SEARCH_SPACE if name in data})
+
+    def save(self, path: str = PIPELINE_CONFIG_FILE, throughput: Optional[float] = None):
+        from datetime import datetime
+
+        data = {**self.to_dict(), "throughput": throughput, "tuned_at": datetime.now().isoformat()}
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+        logger.info(f"Saved pipeline configuration to {path}: {self}")
+
+
+class Autotuner:
+    """
+    Coordinate-ascent hill climbing over PipelineConfig.SEARCH_SPACE.
+    `probe(config)` must process one short window with the given configuration
+    and return {"throughput": images/s, "p95_latency": seconds}. Drift is only
+    judged on batches of at least `min_batch` images (the probe size), since a
+    smaller batch never fills the pipeline and is slower by construction.
+    """
+
+    def __init__(self, probe: Callable[[PipelineConfig], Dict[str, float]],
+                 latency_bound: Optional[float] = None, min_gain: float = 0.05,
+                 max_rounds: int = 3, drift_tolerance: float = 0.35, drift_window: int = 3,
+                 min_batch: int = 1):
+        self.probe = probe
+        self.latency_bound = latency_bound
+        self.min_gain = min_gain
+        self.max_rounds = max_rounds
+        self.drift_tolerance = drift_tolerance
+        self.drift_window = drift_window
+        self.min_batch = min_batch
+        self.baseline: Optional[float] = None
+        self.recent: List[float] = []
+
+    def _measure(self, config: PipelineConfig) -> float:
+        """Throughput of a probe window, or -1 when it breaks the latency bound"""
+        stats = self.probe(config)
+        throughput, p95 = stats.get("throughput", 0.0), stats.get("p95_latency", 0.0)
+        within_bound = self.latency_bound is None or p95 <= self.latency_bound
+        logger.info(f"Probe [{config}]: {throughput:.2f} images/s, p95 latency {p95:.1f}s"
+                    f"{'' if within_bound else ' (over latency bound)'}")
+        return throughput if within_bound else -1.0
+
+    def tune(self, start: PipelineConfig) -> PipelineConfig:
+        """Hill-climb from `start`; returns the best configuration found"""
+        best, best_score = start, self._measure(start)
+
+        for round_number in range(1, self.max_rounds + 1):
+            improved = False
+            for name, values in PipelineConfig.SEARCH_SPACE.items():
+                current = getattr(best, name)
+                index = values.index(current) if current in values else 0
+                for neighbour in (index + 1, index - 1):
+                    if not 0 <= neighbour < len(values):
+                        continue
+                    candidate = best.copy(**{name: values[neighbour]})
+                    score = self._measure(candidate)
+                    if score > max(best_score, 0.0) * (1 + self.min_gain):
+                        best, best_score, improved = candidate, score, True
+                        break
+
+            logger.info(f"Autotune round {round_number}: best [{best}] at {max(best_score, 0.0):.2f} images/s")
+            if not improved:
+                break
+
+        self.baseline = max(best_score, 0.0)
+        self.reset_drift()
+        return best
+
+    def reset_drift(self):
+        """Forget observed batches, e.g. after a re-tune was attempted"""
+        self.recent = []
+
+    def observe(self, throughput: float, batch_images: int) -> bool:
+        """Record a production batch's throughput; True when it has drifted from the tuned baseline"""
+        if not self.baseline or batch_images < self.min_batch:
+            return False
+
+        self.recent = (self.recent + [throughput])[-self.drift_window:]
+        if len(self.recent) < self.drift_window:
+            return False
+
+        average = sum(self.recent) / len(self.recent)
+        drift = abs(average - self.baseline) / self.baseline
+        if drift > self.drift_tolerance:
+            logger.info(f"Throughput drifted {drift:.0%} from tuned baseline "
+                        f"({average:.2f} vs {self.baseline:.2f} images/s)")
+            return True
+        return False
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+FashionXG CLIP Embedding Backfill
+Embeds rated images that have no stored clip_vector so the preference profile
+gets liked_vectors for similarity scoring. Resumable through an on-disk
+embedding cache keyed by image hash.
+
+Requires: pip install open_clip_torch torch pillow
+"""
+
+import os
+import io
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from logging_setup import configure_logging
+from resilience import (DOWNLOAD_TIMEOUT, SERVER_TIMEOUT, PermanentError, RetryPolicy, call_with_retry,
+                        check_response)
+from results_store import ResultsStore, load_json_field
+from update_preference_lib import PREFERENCE_FILE, PROFILES_DIR, SERVER_URL, PreferenceLibraryBuilder
+
+logger = logging.getLogger("clip_backfill")
+
+CACHE_DIR = os.getenv("FASHIONXG_CLIP_CACHE", "clip_cache")
+CLIP_MODEL = "ViT-B-32"
+CLIP_PRETRAINED = "openai"
+
+# Per-process model state for embedding workers
+_worker_model = None
+_worker_preprocess = None
+
+
+class EmbeddingCache:
+    """Vectors stored as <sha256>.npy per model, plus a pin_id -> hash index for resuming"""
+
+    def __init__(self, cache_dir: str, model_key: str):
+        self.dir = Path(cache_dir) / model_key
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.dir / "pins.json"
+        self.pins: Dict[str, str] = {}
+        if self.index_path.exists():
+            with open(self.index_path, 'r') as f:
+                self.pins = json.load(f)
+
+    def _path(self, image_hash: str) -> Path:
+        return self.dir / image_hash[:2] / f"{image_hash}.npy"
+
+    def get(self, image_hash: str) -> Optional[np.ndarray]:
+        path = self._path(image_hash)
+        return np.load(path) if path.exists() else None
+
+    def get_pin(self, pin_id: str) -> Optional[np.ndarray]:
+        image_hash = self.pins.get(pin_id)
+        return self.get(image_hash) if image_hash else None
+
+    def put(self, pin_id: str, image_hash: str, vector: np.ndarray):
+        path = self._path(image_hash)
+        path.parent.mkdir(exist_ok=True)
+        np.save(path, vector.astype(np.float32))
+        self.pins[pin_id] = image_hash
+
+    def save_index(self):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.pins, f)
+        tmp_path.replace(self.index_path)
+
+
+def load_cache(cache_dir: str = CACHE_DIR, model_name: str = CLIP_MODEL,
+               pretrained: str = CLIP_PRETRAINED) -> Optional[EmbeddingCache]:
+    """Existing embedding cache for the model, or None if nothing was ever backfilled"""
+    model_key = f"{model_name}-{pretrained}"
+    if not (Path(cache_dir) / model_key / "pins.json").exists():
+        return None
+    return EmbeddingCache(cache_dir, model_key)
+
+
+def _init_worker(model_name: str, pretrained: str):
+    """Load the CLIP model once per worker process"""
+    global _worker_model, _worker_preprocess
+    import torch
+    import open_clip
+
+    torch.set_num_threads(1)
+    _worker_model, _, _worker_preprocess = open_clip.create_model_and_transforms(model_name, pretrained=pretrained)
+    _worker_model.eval()
+
+
+def _embed_batch(images: List[bytes]) -> List[Optional[np.ndarray]]:
+    """Embed a batch of encoded images into L2-normalised vectors, None for undecodable ones (runs in a worker)"""
+    import torch
+    from PIL import Image
+
+    decoded = {}
+    for i, data in enumerate(images):
+        try:
+            decoded[i] = _worker_preprocess(Image.open(io.BytesIO(data)).convert("RGB"))
+        except Exception:
+            continue
+
+    vectors: List[Optional[np.ndarray]] = [None] * len(images)
+    if decoded:
+        with torch.no_grad():
+            features = _worker_model.encode_image(torch.stack(list(decoded.values())))
+            features = features / features.norm(dim=-1, keepdim=True)
+        for i, feature in zip(decoded, features.cpu().numpy()):
+            vectors[i] = feature
+    return vectors
+
+
+class ClipBackfill:
+    """Find rated images without embeddings, download concurrently, embed in CPU batches"""
+
+    def __init__(self, server_url: str = SERVER_URL, store_path: Optional[str] = None,
+                 designer: Optional[str] = None, cache_dir: str = CACHE_DIR,
+                 model_name: str = CLIP_MODEL, pretrained: str = CLIP_PRETRAINED,
+                 workers: int = max(1, (os.cpu_count() or 2) - 1), download_workers: int = 8,
+                 batch_size: int = 32):
+        self.builder = PreferenceLibraryBuilder(server_url, designer=designer, store_path=store_path)
+        self.server_url = server_url
+        self.store_path = store_path
+        self.model_name = model_name
+        self.pretrained = pretrained
+        self.cache = EmbeddingCache(cache_dir, f"{model_name}-{pretrained}")
+        self.workers = workers
+        self.download_workers = download_workers
+        self.batch_size = batch_size
+        self.download_retry = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=5.0)
+
+    def find_missing(self, images: List[Dict]) -> List[Dict]:
+        """Rated images with no stored clip_vector and no cached embedding"""
+        missing = [image for image in images
+                   if image.get("pin_id") and not load_json_field(image.get("clip_vector"), None)
+                   and self.cache.get_pin(image["pin_id"]) is None]
+
+        no_url = sum(1 for image in missing if not image.get("image_url"))
+        if no_url:
+            hint = " (store synced before image_url was kept: re-run results_store.py sync-ratings)" \
+                if self.store_path else ""
+            logger.warning(f"Skipping {no_url} images without an image_url{hint}")
+        return [image for image in missing if image.get("image_url")]
+
+    def download(self, image: Dict) -> Optional[Tuple[str, bytes]]:
+        def fetch():
+            response = requests.get(image["image_url"], timeout=DOWNLOAD_TIMEOUT)
+            check_response(response)
+            return response.content
+
+        try:
+            return image["pin_id"], call_with_retry(fetch, policy=self.download_retry,
+                                                    retry_on=(requests.RequestException,),
+                                                    description=f"download {image['pin_id']}")
+        except Exception as e:
+            logger.error(f"Failed to download {image['pin_id']}: {e}")
+            return None
+
+    def embed_missing(self, missing: List[Dict]) -> int:
+        """Download and embed missing images; returns how many were embedded"""
+        import importlib.util
+        if not importlib.util.find_spec("open_clip") or not importlib.util.find_spec("torch"):
+            raise RuntimeError("CLIP backfill requires: pip install open_clip_torch torch pillow")
+
+        embedded = 0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(self.download_workers) as downloads, \
+                ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                    initargs=(self.model_name, self.pretrained)) as pool:
+            for offset in range(0, len(missing), self.batch_size):
+                chunk = missing[offset:offset + self.batch_size]
+                batch = [item for item in downloads.map(self.download, chunk) if item]
+
+                # Identical image bytes are embedded once
+                to_embed: Dict[str, List[str]] = {}
+                payloads: Dict[str, bytes] = {}
+                for pin_id, data in batch:
+                    image_hash = hashlib.sha256(data).hexdigest()
+                    cached = self.cache.get(image_hash)
+                    if cached is not None:
+                        self.cache.put(pin_id, image_hash, cached)
+                        continue
+                    to_embed.setdefault(image_hash, []).append(pin_id)
+                    payloads[image_hash] = data
+
+                hashes = list(to_embed)
+                # Split across workers so every process gets a share of the batch
+                step = max(1, -(-len(hashes) // self.workers))
+                groups = [hashes[i:i + step] for i in range(0, len(hashes), step)]
+                for group, vectors in zip(groups, pool.map(_embed_batch, [[payloads[h] for h in g] for g in groups])):
+                    for image_hash, vector in zip(group, vectors):
+                        if vector is None:
+                            logger.error(f"Could not decode image for {to_embed[image_hash]}")
+                            continue
+                        for pin_id in to_embed[image_hash]:
+                            self.cache.put(pin_id, image_hash, vector)
+                            embedded += 1
+
+                # Persist progress after every batch so an interrupted run resumes here
+                self.cache.save_index()
+                done = min(offset + self.batch_size, len(missing))
+                elapsed = time.perf_counter() - start
+                logger.info(f"Embedded {done}/{len(missing)} images - {done / max(elapsed, 1e-9):.1f} images/s")
+
+        return embedded
+
+    def push_vectors(self, images: List[Dict]) -> int:
+        """
+        Send backfilled vectors to the server; returns how many were accepted.
+        /api/tags/update has no vector-only form, so each post repeats the image's
+        current server fields unchanged. This assumes the server accepts the extra
+        `clip_vector` field and leaves designer_rating and review status alone.
+        Images without an aesthetic_score are skipped rather than posted with a
+        null score, and the first rejection (4xx) stops the push.
+        """
+        pushed = incomplete = 0
+        for image in images:
+            vector = self.cache.get_pin(image["pin_id"])
+            if vector is None:
+                continue
+            if image.get("aesthetic_score") is None:
+                incomplete += 1
+                continue
+            payload = {
+                "pin_id": image["pin_id"],
+                "aesthetic_score": image.get("aesthetic_score"),
+                "fashion_tags": load_json_field(image.get("fashion_tags"), {}),
+                "description": image.get("description") or image.get("ai_description", ""),
+                "tags_list": load_json_field(image.get("tags_list"), []),
+                "is_nsfw": image.get("is_nsfw", False),
+                "clip_vector": vector.tolist(),
+            }
+            try:
+                response = requests.post(f"{self.server_url}/api/tags/update", json=payload, timeout=SERVER_TIMEOUT)
+                check_response(response)
+                pushed += 1
+            except PermanentError as e:
+                # Most likely the server does not accept clip_vector: every other post would fail the same way
+                logger.error(f"Server rejected vector for {image['pin_id']}, stopping push: {e}")
+                break
+            except Exception as e:
+                logger.error(f"Failed to push vector for {image['pin_id']}: {e}")
+
+        if incomplete:
+            logger.warning(f"Not pushed: {incomplete} images without an aesthetic_score on the server")
+        return pushed
+
+    def run(self, profile_file: str = PREFERENCE_FILE, push: bool = False):
+        feedback = self.builder.fetch_feedback_data()
+        rated = feedback["liked"] + feedback["disliked"]
+        missing = self.find_missing(rated)
+        logger.info(f"{len(rated)} rated images, {len(missing)} need embeddings "
+                    f"({len(self.cache.pins)} already cached)")
+
+        if missing:
+            start = time.perf_counter()
+            embedded = self.embed_missing(missing)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Backfill embedded {embedded} images in {elapsed:.1f}s "
+                        f"({embedded / max(elapsed, 1e-9):.1f} images/s)")
+
+        # Write liked vectors (stored or backfilled) into the profile
+        liked_vectors = []
+        for image in feedback["liked"]:
+            vector = load_json_field(image.get("clip_vector"), None)
+            if not vector and image.get("pin_id"):
+                cached = self.cache.get_pin(image["pin_id"])
+                vector = cached.tolist() if cached is not None else None
+            if vector:
+                liked_vectors.append(vector)
+
+        profile = {}
+        if Path(profile_file).exists():
+            with open(profile_file, 'r') as f:
+                profile = json.load(f)
+        profile["liked_vectors"] = liked_vectors
+        self.builder.save_profile(profile, profile_file)
+        logger.info(f"Wrote {len(liked_vectors)} liked vectors to {profile_file}")
+
+        # Every rated image with a cached vector but none stored, including ones
+        # embedded by an earlier (interrupted or --push-less) run
+        unstored = [image for image in rated
+                    if image.get("pin_id") and not load_json_field(image.get("clip_vector"), None)
+                    and image["pin_id"] in self.cache.pins]
+
+        if self.store_path:
+            rows = []
+            for image in unstored:
+                vector = self.cache.get_pin(image["pin_id"])
+                if vector is not None:
+                    rows.append({**image, "clip_vector": vector.tolist()})
+            store = ResultsStore(self.store_path)
+            store.import_server_images(rows)
+            store.close()
+            logger.info(f"Stored vectors for {len(rows)} images in {self.store_path}")
+
+        if push:
+            logger.info(f"Pushing vectors for {len(unstored)} images")
+            logger.info(f"Server accepted {self.push_vectors(unstored)} vectors")
+
+
+def main():
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backfill CLIP embeddings for rated FashionXG images")
+    parser.add_argument("--server", type=str, default=SERVER_URL, help="Server URL")
+    parser.add_argument("--store", type=str, default=None, help="Read rated images from the local results store")
+    parser.add_argument("--designer", type=str, default=None, help="Only this designer's ratings")
+    parser.add_argument("--profile", type=str, default=None,
+                        help="Profile file to write liked_vectors into "
+                             "(default: <profiles-dir>/<designer>.json with --designer, else the default profile)")
+    parser.add_argument("--profiles-dir", type=str, default=PROFILES_DIR, help="Directory of per-designer profiles")
+    parser.add_argument("--push", action="store_true", help="Also send the vectors back to the server")
+    parser.add_argument("--cache-dir", type=str, default=CACHE_DIR, help="On-disk embedding cache")
+    parser.add_argument("--model", type=str, default=CLIP_MODEL, help="open_clip model name")
+    parser.add_argument("--pretrained", type=str, default=CLIP_PRETRAINED, help="open_clip pretrained tag")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Embedding processes")
+    parser.add_argument("--download-workers", type=int, default=8, help="Concurrent downloads")
+    parser.add_argument("--batch-size", type=int, default=32, help="Images per embedding batch")
+
+    args = parser.parse_args()
+    if args.designer and args.store:
+        parser.error("--designer needs the server's per-designer ratings and cannot be used with --store")
+    if args.push and args.store:
+        # A push re-posts the image's other fields, which must be the server's current values
+        parser.error("--push re-sends server fields and cannot use possibly stale --store rows")
+
+    configure_logging()
+
+    backfill = ClipBackfill(args.server, store_path=args.store, designer=args.designer, cache_dir=args.cache_dir,
+                            model_name=args.model, pretrained=args.pretrained, workers=args.workers,
+                            download_workers=args.download_workers, batch_size=args.batch_size)
+    # A designer's vectors belong in that designer's profile, never the default one
+    profile_file = args.profile or (str(Path(args.profiles_dir) / f"{args.designer}.json")
+                                    if args.designer else PREFERENCE_FILE)
+    backfill.run(profile_file, push=args.push)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,32 +10,159 @@ import time
 import requests
 import websocket
 import uuid
+import zlib
+import struct
+import random
+import statistics
+import threading
+import urllib.error
 import urllib.request
 import urllib.parse
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 import logging
 
+from profile_scoring import (BLACKLIST_TAGS, DEFAULT_PROFILE, HIGH_PRIORITY_THRESHOLD,
+                             ProfileSet, discover_profiles)
+from results_store import ResultsStore
+from notifications import NotificationDispatcher, create_backend
+from autotune import PIPELINE_CONFIG_FILE, Autotuner, PipelineConfig
+from logging_setup import configure_logging, parse_module_levels
+from memory_monitor import MemoryMonitor
+from resilience import (COMFYUI_TIMEOUT, DOWNLOAD_TIMEOUT, SERVER_TIMEOUT, CircuitBreaker,
+                        DEAD_LETTER_FILE, CircuitOpenError, DeadLetterList, PermanentError, RetryPolicy, call_with_retry,
+                        check_response)
+
 # Configuration
 SERVER_URL = os.getenv("FASHIONXG_SERVER", "https://design.chermz112.xyz")
 COMFYUI_URL = "http://127.0.0.1:8188"
+COMFYUI_INPUT_DIR = Path.home() / "ComfyUI" / "input"
 WORKFLOW_PATH = "fashion_tagger_api.json"
 TEMP_DIR = Path("./temp_images")
 PREFERENCE_FILE = "preference_profile.json"
-
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('comfy_bridge.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
-
-# Blacklist tags that should be filtered out
-BLACKLIST_TAGS = {'text', 'watermark', 'meme', 'blurry', 'low_quality', 'screenshot'}
+PROFILES_DIR = os.getenv("FASHIONXG_PROFILES_DIR", "profiles")
+STORE_PATH = os.getenv("FASHIONXG_STORE", "fashionxg_results.db")
+NOTIFIER = os.getenv("FASHIONXG_NOTIFIER", "auto")
+# profile_scores is not a documented /api/tags/update field: only send it to servers known to accept it
+SEND_PROFILE_SCORES = os.getenv("FASHIONXG_SEND_PROFILE_SCORES", "") == "1"
+KEEP_WARM_MINUTES = 10  # ComfyUI may unload models after this much idle time
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+LOG_FILE = "comfy_bridge.log"
+
+# Handlers are installed by configure_logging() in main()
+logger = logging.getLogger("comfy_bridge")
+
+# Node classes used to locate injection points and outputs in the workflow
+LOAD_IMAGE_CLASS = "LoadImage"
+TAGGER_CLASS_PREFIX = "WD14Tagger"
+TEXT_OUTPUT_CLASSES = {"PreviewAny", "ShowText|pysssss"}
+CAPTION_SOURCE_KEYWORD = "Florence2"
+SCORE_SOURCE_KEYWORD = "Aesthetic"
+
+
+class WorkflowError(ValueError):
+    """Raised when the ComfyUI workflow graph is missing or invalid"""
+
+
+class PromptExecutionError(RuntimeError):
+    """ComfyUI ran the prompt and reported an execution_error for it (a problem with the image, not ComfyUI)"""
+
+
+class WorkflowTemplate:
+    """
+    ComfyUI workflow compiled once at startup.
+    Resolves the LoadImage injection points and the tags/caption/score output
+    nodes, and pre-serialises the prompt so that building a prompt per image
+    is a byte splice instead of a deepcopy + json.dumps.
+    """
+
+    _PLACEHOLDER = "__FASHIONXG_IMAGE__"
+
+    def __init__(self, workflow: Dict):
+        self.workflow = workflow
+        self.validate(workflow)
+
+        self.load_image_nodes = self._find_nodes(lambda n: n["class_type"] == LOAD_IMAGE_CLASS)
+        self.tags_nodes = self._find_nodes(lambda n: n["class_type"].startswith(TAGGER_CLASS_PREFIX))
+        self.caption_nodes = self._find_text_outputs(CAPTION_SOURCE_KEYWORD)
+        self.score_nodes = self._find_text_outputs(SCORE_SOURCE_KEYWORD)
+
+        if not self.load_image_nodes:
+            raise WorkflowError(f"Workflow has no {LOAD_IMAGE_CLASS} node")
+        if not self.tags_nodes:
+            raise WorkflowError(f"Workflow has no {TAGGER_CLASS_PREFIX} node")
+        if not self.caption_nodes:
+            logger.warning("Workflow has no caption output, descriptions will be built from tags")
+        if not self.score_nodes:
+            logger.warning("Workflow has no aesthetic score output, default score will be used")
+
+        # Serialise once with a placeholder, then split into static byte chunks
+        skeleton = {
+            node_id: ({**node, "inputs": {**node["inputs"], "image": self._PLACEHOLDER}}
+                      if node_id in self.load_image_nodes else node)
+            for node_id, node in workflow.items()
+        }
+        marker = json.dumps(self._PLACEHOLDER).encode('utf-8')
+        self._chunks = json.dumps(skeleton).encode('utf-8').split(marker)
+
+        logger.info(f"Compiled workflow: {len(workflow)} nodes, LoadImage={self.load_image_nodes}, "
+                    f"tags={self.tags_nodes}, caption={self.caption_nodes}, score={self.score_nodes}")
+
+    @staticmethod
+    def is_link(value) -> bool:
+        """Links are [source_node_id, output_index]; API-format node ids are strings, so [512, 512] is a value"""
+        return (isinstance(value, list) and len(value) == 2
+                and isinstance(value[0], str) and isinstance(value[1], int))
+
+    @staticmethod
+    def validate(workflow: Dict):
+        """Check the graph structure, raising WorkflowError on the first problem"""
+        if not isinstance(workflow, dict) or not workflow:
+            raise WorkflowError("Workflow must be a non-empty API-format JSON object")
+
+        for node_id, node in workflow.items():
+            if not isinstance(node, dict) or not isinstance(node.get("class_type"), str):
+                raise WorkflowError(f"Node {node_id} has no class_type")
+            inputs = node.get("inputs")
+            if not isinstance(inputs, dict):
+                raise WorkflowError(f"Node {node_id} ({node['class_type']}) has no inputs object")
+
+            for name, value in inputs.items():
+                if WorkflowTemplate.is_link(value) and value[0] not in workflow:
+                    raise WorkflowError(f"Node {node_id} input '{name}' links to missing node {value[0]}")
+
+    def _find_nodes(self, predicate) -> List[str]:
+        return [node_id for node_id, node in self.workflow.items() if predicate(node)]
+
+    def _upstream_class(self, node: Dict) -> str:
+        """class_type of the first node linked into this node's inputs"""
+        for value in node["inputs"].values():
+            if self.is_link(value):
+                return self.workflow[value[0]]["class_type"]
+        return ""
+
+    def _find_text_outputs(self, source_keyword: str) -> List[str]:
+        return self._find_nodes(lambda n: n["class_type"] in TEXT_OUTPUT_CLASSES
+                                and source_keyword in self._upstream_class(n))
+
+    def render(self, image_filename: str) -> bytes:
+        """Serialised prompt with the image filename spliced into every LoadImage node"""
+        return json.dumps(image_filename).encode('utf-8').join(self._chunks)
+
+
+def solid_png(width: int, height: int, rgb: Tuple[int, int, int]) -> bytes:
+    """Minimal single-colour PNG (used as the warm-up image, no imaging library needed)"""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    row = b"\x00" + bytes(rgb) * width
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height))
+            + chunk(b"IEND", b""))
 
 
 class ComfyUIClient:
@@ -47,46 +174,113 @@ class ComfyUIClient:
 
     def queue_prompt(self, prompt: Dict) -> str:
         """Queue a prompt to ComfyUI and return the prompt_id"""
-        p = {"prompt": prompt, "client_id": self.client_id}
-        data = json.dumps(p).encode('utf-8')
+        return self.queue_prompt_bytes(json.dumps(prompt).encode('utf-8'))
+
+    def queue_prompt_bytes(self, prompt: bytes) -> str:
+        """Queue an already-serialised prompt to ComfyUI and return the prompt_id"""
+        data = b'{"prompt": ' + prompt + b', "client_id": ' + json.dumps(self.client_id).encode('utf-8') + b'}'
         req = urllib.request.Request(f"{self.server_address}/prompt", data=data)
-        response = json.loads(urllib.request.urlopen(req).read())
-        return response['prompt_id']
+        with urllib.request.urlopen(req, timeout=COMFYUI_TIMEOUT) as response:
+            return json.loads(response.read())['prompt_id']
 
     def get_image(self, filename: str, subfolder: str, folder_type: str) -> bytes:
         """Get image data from ComfyUI output"""
         data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
         url_values = urllib.parse.urlencode(data)
-        with urllib.request.urlopen(f"{self.server_address}/view?{url_values}") as response:
+        with urllib.request.urlopen(f"{self.server_address}/view?{url_values}", timeout=COMFYUI_TIMEOUT) as response:
             return response.read()
 
     def get_history(self, prompt_id: str) -> Dict:
         """Get execution history for a prompt"""
-        with urllib.request.urlopen(f"{self.server_address}/history/{prompt_id}") as response:
+        with urllib.request.urlopen(f"{self.server_address}/history/{prompt_id}", timeout=COMFYUI_TIMEOUT) as response:
             return json.loads(response.read())
 
-    def track_progress(self, prompt_id: str, timeout: int = 300) -> Dict:
-        """Track prompt execution via WebSocket"""
-        ws = websocket.WebSocket()
-        ws.connect(f"ws://{self.server_address.split('://')[-1]}/ws?clientId={self.client_id}")
+    def get_queue(self) -> Dict:
+        """Running and pending prompts: {"queue_running": [[number, prompt_id, ...]], "queue_pending": [...]}"""
+        with urllib.request.urlopen(f"{self.server_address}/queue", timeout=COMFYUI_TIMEOUT) as response:
+            return json.loads(response.read())
 
-        start_time = time.time()
-        while True:
-            if time.time() - start_time > timeout:
-                ws.close()
-                raise TimeoutError(f"Prompt {prompt_id} timed out after {timeout}s")
+    def _post(self, path: str, body: Dict):
+        req = urllib.request.Request(f"{self.server_address}{path}", data=json.dumps(body).encode('utf-8'))
+        with urllib.request.urlopen(req, timeout=COMFYUI_TIMEOUT) as response:
+            response.read()
+
+    def queue_position(self, prompt_id: str) -> Optional[str]:
+        """"running" or "pending" while the prompt is in ComfyUI's queue, else None"""
+        queue = self.get_queue()
+        for state in ("running", "pending"):
+            if any(len(item) > 1 and item[1] == prompt_id for item in queue.get(f"queue_{state}", [])):
+                return state
+        return None
+
+    def cancel_prompt(self, prompt_id: str):
+        """Stop an abandoned prompt: interrupt it if it is running, otherwise remove it from the queue"""
+        if self.queue_position(prompt_id) == "running":
+            self._post("/interrupt", {"prompt_id": prompt_id})
+        else:
+            self._post("/queue", {"delete": [prompt_id]})
+        self.delete_history(prompt_id)
+
+    def delete_history(self, prompt_id: str):
+        """Drop a finished prompt from ComfyUI's history so its outputs are not kept server-side"""
+        self._post("/history", {"delete": [prompt_id]})
 
-            out = ws.recv()
-            if isinstance(out, str):
-                message = json.loads(out)
-                if message['type'] == 'executing':
-                    data = message['data']
-                    if data['node'] is None and data['prompt_id'] == prompt_id:
-                        ws.close()
-                        return self.get_history(prompt_id)[prompt_id]
+    def track_progress(self, prompt_id: str, timeout: int = 300, idle_timeout: int = 60) -> Dict:
+        """
+        Track prompt execution via WebSocket.
+        Fails after `timeout` seconds overall, or after `idle_timeout` seconds without
+        any message from ComfyUI while the prompt is neither finished (completion may
+        have been missed) nor still in ComfyUI's queue. ComfyUI sends nothing to a
+        client whose prompt is waiting behind others, so queued time is not idle time.
+        An abandoned prompt is cancelled so it does not keep the GPU busy.
+        """
+        ws = websocket.WebSocket()
+        ws.connect(f"ws://{self.server_address.split('://')[-1]}/ws?clientId={self.client_id}",
+                   timeout=COMFYUI_TIMEOUT)
+        ws.settimeout(5)
 
-        ws.close()
-        return {}
+        try:
+            start_time = time.time()
+            last_message = start_time
+            while True:
+                now = time.time()
+                if now - start_time > timeout:
+                    self._abandon(prompt_id)
+                    raise TimeoutError(f"Prompt {prompt_id} timed out after {timeout}s")
+
+                if now - last_message > idle_timeout:
+                    history = self.get_history(prompt_id)
+                    if prompt_id in history:
+                        return history[prompt_id]
+                    if self.queue_position(prompt_id):
+                        last_message = time.time()
+                        continue
+                    raise TimeoutError(f"Prompt {prompt_id} stalled: no progress for {idle_timeout}s")
+
+                try:
+                    out = ws.recv()
+                except websocket.WebSocketTimeoutException:
+                    continue
+
+                last_message = time.time()
+                if isinstance(out, str):
+                    message = json.loads(out)
+                    if message['type'] == 'executing':
+                        data = message['data']
+                        if data['node'] is None and data['prompt_id'] == prompt_id:
+                            return self.get_history(prompt_id)[prompt_id]
+                    elif message['type'] == 'execution_error' and message['data'].get('prompt_id') == prompt_id:
+                        raise PromptExecutionError(f"Prompt {prompt_id} failed in ComfyUI: "
+                                           f"{message['data'].get('exception_message', 'unknown error')}")
+        finally:
+            ws.close()
+
+    def _abandon(self, prompt_id: str):
+        try:
+            self.cancel_prompt(prompt_id)
+            logger.warning(f"Cancelled abandoned prompt {prompt_id}")
+        except Exception as e:
+            logger.warning(f"Could not cancel prompt {prompt_id}: {e}")
 
 
 class FashionXGBridge:
@@ -94,35 +288,56 @@ class FashionXGBridge:
 
     def __init__(self):
         self.comfy_client = ComfyUIClient()
+        self._thread_local = threading.local()
+        self.pipeline = PipelineConfig.load(PIPELINE_CONFIG_FILE)
+        self.last_batch_stats: Dict[str, float] = {}
+        self.autotuner: Optional[Autotuner] = None
+
+        # Model warm-up state and ComfyUI latencies split by cold/warm models
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+        self.models_warm = False
+        self.last_prompt_at = 0.0
+        self.comfy_latencies = {"cold": deque(maxlen=500), "warm": deque(maxlen=500), "warmup": deque(maxlen=50)}
         self.workflow = self.load_workflow()
-        self.preferences = self.load_preferences()
+        self.profiles = ProfileSet(discover_profiles(PREFERENCE_FILE, PROFILES_DIR))
+        self.store = ResultsStore(STORE_PATH) if STORE_PATH else None
+        self.dead_letters = DeadLetterList(DEAD_LETTER_FILE)
+        self.notifier = NotificationDispatcher(create_backend(NOTIFIER))
+        self.breakers = {
+            "server": CircuitBreaker("server", failure_threshold=5, reset_timeout=60),
+            "download": CircuitBreaker("download", failure_threshold=10, reset_timeout=60),
+            "comfyui": CircuitBreaker("comfyui", failure_threshold=3, reset_timeout=30),
+        }
+        self.server_retry = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=20.0)
+        self.download_retry = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=5.0)
         TEMP_DIR.mkdir(exist_ok=True)
 
-    def load_workflow(self) -> Dict:
-        """Load ComfyUI workflow from JSON file"""
+    def load_workflow(self) -> WorkflowTemplate:
+        """Load ComfyUI workflow from JSON file and compile it into a template"""
         if not Path(WORKFLOW_PATH).exists():
             logger.error(f"Workflow file not found: {WORKFLOW_PATH}")
             logger.info("Please export your ComfyUI workflow in API format and save as fashion_tagger_api.json")
-            return {}
+            raise WorkflowError(f"Workflow file not found: {WORKFLOW_PATH}")
 
-        with open(WORKFLOW_PATH, 'r') as f:
-            return json.load(f)
-
-    def load_preferences(self) -> Dict:
-        """Load designer preferences from file"""
-        if not Path(PREFERENCE_FILE).exists():
-            logger.warning(f"Preference file not found: {PREFERENCE_FILE}")
-            return {"liked_tags": [], "disliked_tags": [], "liked_vectors": []}
+        try:
+            with open(WORKFLOW_PATH, 'r') as f:
+                workflow = json.load(f)
+        except json.JSONDecodeError as e:
+            raise WorkflowError(f"Workflow file is not valid JSON: {e}") from e
 
-        with open(PREFERENCE_FILE, 'r') as f:
-            return json.load(f)
+        return WorkflowTemplate(workflow)
 
     def fetch_pending_images(self) -> List[Dict]:
         """Fetch pending images from server API"""
-        try:
-            response = requests.get(f"{SERVER_URL}/api/images/pending", timeout=30)
+        def fetch():
+            response = requests.get(f"{SERVER_URL}/api/images/pending", timeout=SERVER_TIMEOUT)
             response.raise_for_status()
-            data = response.json()
+            return response.json()
+
+        try:
+            data = call_with_retry(fetch, self.breakers["server"], self.server_retry,
+                                   retry_on=(requests.RequestException,), description="fetch pending")
             # API returns {"images": [...], "total": N, ...}
             return data.get("images", [])
         except Exception as e:
@@ -131,62 +346,174 @@ class FashionXGBridge:
 
     def download_image(self, image_url: str, pin_id: str) -> Optional[Path]:
         """Download image to temp directory"""
-        try:
-            temp_path = TEMP_DIR / f"{pin_id}.jpg"
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
+        temp_path = TEMP_DIR / f"{pin_id}.jpg"
+
+        def download():
+            # Streamed to disk so the image is never held in memory whole
+            with requests.get(image_url, timeout=DOWNLOAD_TIMEOUT, stream=True) as response:
+                # A missing or forbidden image will not fix itself, so 4xx is not retried
+                check_response(response)
+                try:
+                    with open(temp_path, 'wb') as f:
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                except Exception:
+                    temp_path.unlink(missing_ok=True)
+                    raise
 
-            with open(temp_path, 'wb') as f:
-                f.write(response.content)
+        try:
+            call_with_retry(download, self.breakers["download"], self.download_retry,
+                            retry_on=(requests.RequestException,), description=f"download {pin_id}")
 
-            logger.info(f"Downloaded image: {pin_id}")
+            logger.debug(f"Downloaded image: {pin_id}")
             return temp_path
+        except CircuitOpenError as e:
+            logger.warning(str(e))
+            return None
+        except PermanentError as e:
+            logger.error(f"Failed to download image {pin_id}: {e}")
+            self.dead_letters.record_failure(pin_id, "download", e, permanent=True)
+            return None
         except Exception as e:
+            # Timeouts, connection errors and 5xx say nothing about the image: retried next batch
             logger.error(f"Failed to download image {pin_id}: {e}")
             return None
 
-    def process_image_with_comfyui(self, image_path: Path) -> Optional[Dict]:
+    def get_comfy_client(self) -> ComfyUIClient:
+        """
+        ComfyUI client for the calling thread. Each in-flight prompt needs its own
+        client_id, since ComfyUI only sends progress to the latest socket of a client.
+        """
+        if threading.current_thread() is threading.main_thread():
+            return self.comfy_client
+        if not hasattr(self._thread_local, "client"):
+            self._thread_local.client = ComfyUIClient(self.comfy_client.server_address)
+        return self._thread_local.client
+
+    def process_image_with_comfyui(self, image_path: Path, pin_id: Optional[str] = None) -> Optional[Dict]:
         """Send image to ComfyUI and get results"""
-        if not self.workflow:
-            logger.error("No workflow loaded, cannot process image")
+        pin_id = pin_id or image_path.stem
+        breaker = self.breakers["comfyui"]
+        if not breaker.allow():
+            logger.warning(f"Circuit comfyui is open, skipping {pin_id} "
+                           f"(retry in {breaker.retry_after():.0f}s)")
             return None
 
+        comfyui_image_path = None
         try:
             # Copy image to ComfyUI input directory
             import shutil
-            comfyui_input_dir = Path.home() / "ComfyUI" / "input"
-            comfyui_input_dir.mkdir(exist_ok=True)
+            COMFYUI_INPUT_DIR.mkdir(exist_ok=True)
 
             # Use just the filename for ComfyUI
             image_filename = image_path.name
-            comfyui_image_path = comfyui_input_dir / image_filename
+            comfyui_image_path = COMFYUI_INPUT_DIR / image_filename
             shutil.copy(image_path, comfyui_image_path)
-            logger.info(f"Copied image to ComfyUI input: {comfyui_image_path}")
-
-            # Modify workflow to use the image filename (not full path)
-            import copy
-            workflow = copy.deepcopy(self.workflow)
-
-            # Find LoadImage node and update with just the filename
-            for node_id, node_data in workflow.items():
-                if node_data.get("class_type") == "LoadImage":
-                    node_data["inputs"]["image"] = image_filename
-                    break
+            logger.debug(f"Copied image to ComfyUI input: {comfyui_image_path}")
 
-            # Queue the prompt
-            prompt_id = self.comfy_client.queue_prompt(workflow)
-            logger.info(f"Queued prompt: {prompt_id}")
+            # Splice the image filename (not full path) into the compiled workflow
+            comfy_client = self.get_comfy_client()
+            kind = "warm" if self.models_warm and not self.is_idle() else "cold"
+            started = time.perf_counter()
+            prompt_id = comfy_client.queue_prompt_bytes(self.workflow.render(image_filename))
+            logger.debug(f"Queued prompt: {prompt_id}")
 
             # Track progress
-            history = self.comfy_client.track_progress(prompt_id)
+            history = comfy_client.track_progress(prompt_id)
+            self.record_comfy_latency(kind, time.perf_counter() - started)
 
             # Parse results from history
             results = self.parse_comfyui_results(history)
+            breaker.record_success()
+
+            try:
+                comfy_client.delete_history(prompt_id)
+            except Exception as e:
+                logger.debug(f"Could not delete ComfyUI history for {prompt_id}: {e}")
             return results
 
+        except PromptExecutionError as e:
+            # ComfyUI answered, so this says nothing about its health
+            breaker.record_success()
+            logger.error(f"Failed to process image with ComfyUI: {e}")
+            self.dead_letters.record_failure(pin_id, "comfyui", e)
+            return None
         except Exception as e:
+            # Unreachable, restarted or stalled ComfyUI: not the image's fault, retried next batch
+            breaker.record_failure()
             logger.error(f"Failed to process image with ComfyUI: {e}")
             return None
+        finally:
+            # The input copy is only needed while the prompt runs
+            if comfyui_image_path:
+                comfyui_image_path.unlink(missing_ok=True)
+
+    def is_idle(self) -> bool:
+        """True when ComfyUI may have unloaded models since the last prompt"""
+        return KEEP_WARM_MINUTES > 0 and time.time() - self.last_prompt_at > KEEP_WARM_MINUTES * 60
+
+    def record_comfy_latency(self, kind: str, seconds: float):
+        self.comfy_latencies[kind].append(seconds)
+        self.last_prompt_at = time.time()
+        self.models_warm = True
+        logger.debug(f"ComfyUI latency: {seconds:.2f}s ({kind})")
+
+    def comfy_latency_summary(self) -> Dict[str, float]:
+        """Median ComfyUI latency per kind (cold / warm / warmup)"""
+        return {kind: statistics.median(values) for kind, values in self.comfy_latencies.items() if values}
+
+    def warm_up(self, reason: str = "startup") -> Optional[threading.Thread]:
+        """
+        Submit a synthetic prompt in the background so ComfyUI loads the tagger and
+        aesthetic models before real images arrive. Nothing waits for it; a real
+        image submitted meanwhile simply queues behind it in ComfyUI.
+        """
+        if self._warmup_thread and self._warmup_thread.is_alive():
+            return self._warmup_thread
+
+        self._warmup_thread = threading.Thread(target=self._run_warm_up, args=(reason,),
+                                               name="comfyui-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _run_warm_up(self, reason: str):
+        if not self._warmup_lock.acquire(blocking=False):
+            return
+        try:
+            # Unique content every time, otherwise ComfyUI answers from its output cache
+            COMFYUI_INPUT_DIR.mkdir(parents=True, exist_ok=True)
+            for old in COMFYUI_INPUT_DIR.glob("fashionxg_warmup_*.png"):
+                old.unlink(missing_ok=True)
+            image_filename = f"fashionxg_warmup_{uuid.uuid4().hex[:8]}.png"
+            color = tuple(random.randrange(256) for _ in range(3))
+            (COMFYUI_INPUT_DIR / image_filename).write_bytes(solid_png(64, 64, color))
+
+            client = ComfyUIClient(self.comfy_client.server_address)
+            started = time.perf_counter()
+            prompt_id = client.queue_prompt_bytes(self.workflow.render(image_filename))
+            client.track_progress(prompt_id)
+            elapsed = time.perf_counter() - started
+
+            self.comfy_latencies["warmup"].append(elapsed)
+            self.last_prompt_at = time.time()
+            self.models_warm = True
+            logger.info(f"ComfyUI warm-up ({reason}) finished in {elapsed:.2f}s")
+        except Exception as e:
+            logger.warning(f"ComfyUI warm-up ({reason}) failed: {e}")
+        finally:
+            self._warmup_lock.release()
+
+    def sleep_keeping_warm(self, seconds: float):
+        """Sleep between batches, re-warming ComfyUI whenever it has been idle too long"""
+        deadline = time.time() + seconds
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            if self.is_idle() and self.models_warm:
+                self.models_warm = False
+                self.warm_up("keep-warm")
+            time.sleep(min(remaining, 30.0))
 
     def parse_comfyui_results(self, history: Dict) -> Dict:
         """Parse ComfyUI execution results"""
@@ -201,37 +528,37 @@ class FashionXGBridge:
         try:
             # Extract outputs from history
             outputs = history.get("outputs", {})
-            logger.info(f"Parsing outputs from nodes: {list(outputs.keys())}")
+            logger.debug(f"Parsing outputs from nodes: {list(outputs.keys())}")
 
             for node_id, node_output in outputs.items():
-                logger.info(f"Node {node_id} output keys: {list(node_output.keys())}")
+                logger.debug(f"Node {node_id} output keys: {list(node_output.keys())}")
 
                 # WD14 Tagger output - tags is a list with one string of comma-separated tags
-                if "tags" in node_output:
+                if "tags" in node_output and node_id in self.workflow.tags_nodes:
                     tags_data = node_output["tags"]
                     if isinstance(tags_data, list) and len(tags_data) > 0:
                         # Split the comma-separated string into individual tags
                         tags_str = tags_data[0]
                         results["tags_list"] = [t.strip() for t in tags_str.split(",")]
-                        logger.info(f"Parsed {len(results['tags_list'])} tags")
+                        logger.debug(f"Parsed {len(results['tags_list'])} tags")
 
-                # PreviewAny output for Aesthetic Score (node 7) - text contains score as string
-                if "text" in node_output and node_id == "7":
+                # PreviewAny output for Aesthetic Score - text contains score as string
+                if "text" in node_output and node_id in self.workflow.score_nodes:
                     text_data = node_output["text"]
                     if isinstance(text_data, list) and len(text_data) > 0:
                         try:
                             score = float(text_data[0])
                             results["aesthetic_score"] = score
-                            logger.info(f"Parsed aesthetic score: {score}")
+                            logger.debug(f"Parsed aesthetic score: {score}")
                         except ValueError:
                             pass
 
-                # PreviewAny output for Florence-2 caption (node 6)
-                if "text" in node_output and node_id == "6":
+                # PreviewAny output for Florence-2 caption
+                if "text" in node_output and node_id in self.workflow.caption_nodes:
                     text_data = node_output["text"]
                     if isinstance(text_data, list) and len(text_data) > 0:
                         results["ai_description"] = text_data[0]
-                        logger.info(f"Parsed AI description: {text_data[0][:50]}...")
+                        logger.debug(f"Parsed AI description: {text_data[0][:50]}...")
 
             # Categorize tags into fashion categories
             results["fashion_tags"] = self.categorize_tags(results["tags_list"])
@@ -277,69 +604,38 @@ class FashionXGBridge:
 
         return categories
 
-    def calculate_tag_match_score(self, tags: List[str]) -> float:
-        """Calculate how well tags match designer preferences"""
-        if not self.preferences.get("liked_tags"):
-            return 0.5  # Neutral score if no preferences
-
-        liked_tags = set(self.preferences["liked_tags"])
-        disliked_tags = set(self.preferences.get("disliked_tags", []))
-
-        tag_set = set(tag.lower() for tag in tags)
-
-        # Check for disliked tags (hard filter)
-        if tag_set & disliked_tags:
-            return 0.0
-
-        # Calculate overlap with liked tags
-        overlap = len(tag_set & liked_tags)
-        if len(liked_tags) > 0:
-            return min(overlap / len(liked_tags), 1.0)
-
-        return 0.5
-
-    def calculate_final_priority(self, results: Dict, image_vector: Optional[List[float]] = None) -> Tuple[float, int]:
+    def calculate_profile_priorities(self, results: Dict,
+                                     image_vector: Optional[List[float]] = None) -> Dict[str, Tuple[float, int]]:
         """
-        Calculate final priority score using composite logic
-        Returns: (priority_score, process_status)
+        Score the image against every loaded preference profile in one vectorized pass
+        Returns: {profile_name: (priority_score, process_status)}
         """
         tags = results.get("tags_list", [])
         aesthetic_score = results.get("aesthetic_score", 0.0)
 
-        # Hard filter: Check blacklist tags
-        tag_set = set(tag.lower() for tag in tags)
-        if tag_set & BLACKLIST_TAGS:
-            logger.info(f"Image filtered out due to blacklist tags: {tag_set & BLACKLIST_TAGS}")
-            return 0.0, -1  # Mark as rejected
-
-        # Calculate tag match score
-        tag_match = self.calculate_tag_match_score(tags)
-
-        # Calculate similarity score (placeholder - requires CLIP implementation)
-        similarity = 0.5  # Default neutral
-        if image_vector and self.preferences.get("liked_vectors"):
-            # TODO: Implement CLIP vector similarity calculation
-            # similarity = max(cosine_similarity(image_vector, liked_vec) for liked_vec in self.preferences["liked_vectors"])
-            pass
+        # Hard filter: blacklist tags reject the image for every profile
+        blacklisted = set(tag.lower() for tag in tags) & BLACKLIST_TAGS
+        if blacklisted:
+            logger.info(f"Image filtered out due to blacklist tags: {blacklisted}")
 
         # Composite score: aesthetic * 0.4 + similarity * 0.4 + tag_match * 0.2
-        final_score = (aesthetic_score / 10.0) * 0.4 + similarity * 0.4 + tag_match * 0.2
+        priorities = self.profiles.score(tags, aesthetic_score, image_vector)
 
-        # Determine process status
-        if final_score >= 0.8:
-            process_status = 2  # High priority - archive immediately
-        elif final_score >= 0.5:
-            process_status = 1  # Medium priority - needs review
-        else:
-            process_status = -1  # Low priority - reject
+        logger.debug(f"Priority calculation - Aesthetic: {aesthetic_score:.2f}, " + ", ".join(
+            f"{name}: {score:.2f}/{status}" for name, (score, status) in priorities.items()))
 
-        logger.info(f"Priority calculation - Aesthetic: {aesthetic_score:.2f}, Tag Match: {tag_match:.2f}, "
-                   f"Similarity: {similarity:.2f}, Final: {final_score:.2f}, Status: {process_status}")
+        return priorities
 
-        return final_score, process_status
+    def calculate_final_priority(self, results: Dict, image_vector: Optional[List[float]] = None) -> Tuple[float, int]:
+        """
+        Calculate final priority score against the default profile
+        Returns: (priority_score, process_status)
+        """
+        return self.calculate_profile_priorities(results, image_vector)[DEFAULT_PROFILE]
 
-    def send_results_to_server(self, pin_id: str, results: Dict, priority_score: float, process_status: int) -> bool:
-        """Send processed results back to server"""
+    def send_results_to_server(self, pin_id: str, results: Dict, priority_score: float, process_status: int,
+                               profile_priorities: Optional[Dict[str, Tuple[float, int]]] = None) -> bool:
+        """Send processed results back to server (idempotent per pin_id, so safe to retry)"""
         try:
             # API only accepts these fields
             payload = {
@@ -351,143 +647,414 @@ class FashionXGBridge:
                 "is_nsfw": results.get("is_nsfw", False)
             }
 
-            logger.info(f"Sending payload: aesthetic_score={payload['aesthetic_score']:.2f}, tags={len(payload['tags_list'])}")
+            # Per-designer scores, only when enabled and more than the default profile is loaded
+            if SEND_PROFILE_SCORES and profile_priorities and len(profile_priorities) > 1:
+                payload["profile_scores"] = {
+                    name: {"priority_score": round(score, 4), "process_status": status}
+                    for name, (score, status) in profile_priorities.items()
+                }
 
-            response = requests.post(f"{SERVER_URL}/api/tags/update", json=payload, timeout=30)
-            response.raise_for_status()
+            logger.debug(f"Sending payload: aesthetic_score={payload['aesthetic_score']:.2f}, tags={len(payload['tags_list'])}")
 
-            logger.info(f"Successfully sent results for {pin_id}")
+            def upload():
+                response = requests.post(f"{SERVER_URL}/api/tags/update", json=payload,
+                                         headers={"Idempotency-Key": pin_id}, timeout=SERVER_TIMEOUT)
+                check_response(response)
+
+            call_with_retry(upload, self.breakers["server"], self.server_retry,
+                            retry_on=(requests.RequestException,), description=f"upload {pin_id}")
+
+            logger.debug(f"Successfully sent results for {pin_id}")
             return True
 
+        except PermanentError as e:
+            # Server rejected the payload itself: retrying the same payload cannot succeed
+            logger.error(f"Server rejected results for {pin_id}: {e}")
+            self.dead_letters.record_failure(pin_id, "upload", e, permanent=True)
+            return False
         except Exception as e:
             logger.error(f"Failed to send results for {pin_id}: {e}")
             return False
 
+    def record_local_result(self, pin_id: str, results: Dict, priority_score: float, process_status: int,
+                            profile_priorities: Dict[str, Tuple[float, int]], uploaded: bool):
+        """Append result to the local results store"""
+        if not self.store:
+            return
+
+        try:
+            self.store.record_result(pin_id, results, priority_score, process_status,
+                                     profile_priorities, uploaded)
+        except Exception as e:
+            logger.error(f"Failed to record {pin_id} in local store: {e}")
+
+    def flush_pending_uploads(self) -> set:
+        """
+        Re-send finished results whose upload failed earlier, so GPU work is not lost.
+        Returns the pin_ids still waiting for upload.
+        """
+        if not self.store:
+            return set()
+
+        pending = self.store.pending_uploads()
+        if pending:
+            logger.info(f"Retrying {len(pending)} pending uploads from local store")
+
+        still_pending = set()
+        for pin_id, results, priority_score, process_status, profile_priorities in pending:
+            if not self.breakers["server"].blocked() and self.send_results_to_server(
+                    pin_id, results, priority_score, process_status, profile_priorities):
+                self.store.mark_uploaded(pin_id)
+            elif self.dead_letters.is_dead(pin_id):
+                self.store.mark_uploaded(pin_id, uploaded=-1)
+            else:
+                still_pending.add(pin_id)
+
+        return still_pending
+
     def cleanup_temp_image(self, image_path: Path):
         """Delete temporary image file"""
         try:
             if image_path.exists():
                 image_path.unlink()
-                logger.info(f"Cleaned up temp file: {image_path}")
+                logger.debug(f"Cleaned up temp file: {image_path}")
         except Exception as e:
             logger.error(f"Failed to cleanup {image_path}: {e}")
 
     def notify_high_priority(self, pin_id: str, score: float):
-        """Send system notification for high-priority discoveries"""
-        try:
-            # macOS notification
-            os.system(f'osascript -e \'display notification "Score: {score:.2f}" with title "FashionXG: High Priority Image Found" subtitle "Pin ID: {pin_id}"\'')
-            logger.info(f"Sent notification for high-priority image: {pin_id}")
-        except Exception as e:
-            logger.error(f"Failed to send notification: {e}")
+        """Queue a notification for a high-priority discovery (delivered in the background)"""
+        self.notifier.notify(pin_id, score)
+
+    def close(self):
+        """Flush pending notifications and dead letters, and close the local store"""
+        self.notifier.close()
+        self.dead_letters.flush()
+        if self.store:
+            self.store.close()
 
     def process_batch(self, batch_size: int = 10):
         """Process a batch of pending images"""
+        # Pick up entries cleared with `resilience.py clear` while the bridge was running
+        self.dead_letters.refresh()
+
+        # Results already computed but not yet accepted by the server are not re-processed
+        awaiting_upload = self.flush_pending_uploads()
+
         logger.info(f"Fetching up to {batch_size} pending images...")
         pending_images = self.fetch_pending_images()
 
         if not pending_images:
             logger.info("No pending images to process")
+            self.last_batch_stats = {}
             return 0
 
-        # Limit batch size
-        pending_images = pending_images[:batch_size]
+        # Filter before limiting, or dead-lettered pins at the head of the feed starve every batch
+        pending_images = self.select_runnable(pending_images, awaiting_upload)[:batch_size]
         logger.info(f"Processing {len(pending_images)} images")
 
-        processed_count = 0
+        self.last_batch_stats = self.process_images(pending_images)
+        processed_count = self.last_batch_stats["processed"]
+
+        self.last_batch_stats["comfy_latency"] = self.comfy_latency_summary()
+        latency = ", ".join(f"{kind} {value:.2f}s" for kind, value in self.last_batch_stats["comfy_latency"].items())
+        logger.info(f"Batch complete: {processed_count}/{len(pending_images)} images processed successfully "
+                    f"({self.last_batch_stats['throughput']:.2f} images/s"
+                    f"{f'; median ComfyUI latency: {latency}' if latency else ''})")
+        return processed_count
 
+    def select_runnable(self, pending_images: List[Dict], awaiting_upload: set) -> List[Dict]:
+        """Drop malformed, dead-lettered and already-processed (awaiting upload) images"""
+        runnable = []
+        skipped = 0
         for image_data in pending_images:
             pin_id = image_data.get("pin_id")
-            image_url = image_data.get("image_url")
-
-            if not pin_id or not image_url:
+            if not pin_id or not image_data.get("image_url"):
                 logger.warning(f"Skipping image with missing data: {image_data}")
-                continue
-
-            logger.info(f"Processing image: {pin_id}")
-
-            # Download image
-            image_path = self.download_image(image_url, pin_id)
-            if not image_path:
-                continue
+            elif pin_id in awaiting_upload or self.dead_letters.is_dead(pin_id):
+                logger.debug(f"Skipping {pin_id}: awaiting upload or dead-lettered")
+                skipped += 1
+            else:
+                runnable.append(image_data)
+
+        if skipped:
+            logger.info(f"Skipping {skipped} pending images awaiting upload or dead-lettered")
+        return runnable
+
+    def run_autotune(self, probe_size: int = 8, latency_bound: Optional[float] = None,
+                     synthetic_url: Optional[str] = None) -> PipelineConfig:
+        """
+        Tune the pipeline over short probe windows and persist the result.
+        Live probes process real pending images; synthetic probes repeatedly run
+        `synthetic_url` through ComfyUI without uploading anything.
+        """
+        def probe(config: PipelineConfig) -> Dict[str, float]:
+            if synthetic_url:
+                images = [{"pin_id": f"autotune-{uuid.uuid4().hex[:12]}", "image_url": synthetic_url}
+                          for _ in range(probe_size)]
+                return self.process_images(images, config, upload=False)
+
+            images = self.select_runnable(self.fetch_pending_images(), self.flush_pending_uploads())
+            return self.process_images(images[:probe_size], config)
+
+        # Whatever happens below, drift observations so far have been acted on
+        if self.autotuner:
+            self.autotuner.reset_drift()
+
+        if not synthetic_url and not self.fetch_pending_images():
+            logger.warning("No pending images for live autotune, keeping current pipeline configuration")
+            return self.pipeline
+
+        logger.info(f"Autotuning pipeline from [{self.pipeline}] with {probe_size}-image probes"
+                    f"{f', p95 latency bound {latency_bound}s' if latency_bound else ''}")
+        if self.autotuner is None:
+            self.autotuner = Autotuner(probe, latency_bound, min_batch=probe_size)
+        self.pipeline = self.autotuner.tune(self.pipeline)
+        self.pipeline.save(PIPELINE_CONFIG_FILE, self.autotuner.baseline)
+        return self.pipeline
+
+    def process_images(self, images: List[Dict], config: Optional[PipelineConfig] = None,
+                       upload: bool = True) -> Dict[str, float]:
+        """
+        Run images through download -> ComfyUI -> upload as overlapping stages.
+        Downloads prefetch on `download_workers` threads, up to `inflight_prompts`
+        prompts are in ComfyUI at once, and uploads run on `upload_workers` threads.
+        With upload=False (synthetic autotune probes) results are discarded.
+        Returns submitted and processed counts, throughput (images/s) and p95 latency (s).
+        Per-image latency runs from download start to upload, minus the time a
+        prefetched image waits for a free prompt slot, so it does not grow with
+        the number of images in the batch.
+        """
+        config = config or self.pipeline
+        latencies: List[float] = []
+        start = time.perf_counter()
 
-            # Process with ComfyUI
-            results = self.process_image_with_comfyui(image_path)
-            if not results:
+        def upload_stage(image_data: Dict, image_path: Path, results: Dict, started: float) -> bool:
+            pin_id = image_data["pin_id"]
+            try:
+                if not upload:
+                    return True
+
+                # Calculate priority against all profiles
+                profile_priorities = self.calculate_profile_priorities(results)
+                priority_score, process_status = profile_priorities[DEFAULT_PROFILE]
+
+                # Send results to server
+                success = self.send_results_to_server(pin_id, results, priority_score, process_status,
+                                                      profile_priorities)
+
+                # Keep a local copy for analytics and offline preference building;
+                # failed uploads stay marked pending and are retried next batch
+                self.record_local_result(pin_id, results, priority_score, process_status,
+                                         profile_priorities, success)
+
+                # Notify if high priority
+                if priority_score >= HIGH_PRIORITY_THRESHOLD:
+                    self.notify_high_priority(pin_id, priority_score)
+
+                # One INFO record per image; per-stage detail is at DEBUG
+                logger.info(f"Processed {pin_id}: aesthetic={results.get('aesthetic_score') or 0.0:.2f}, "
+                            f"priority={priority_score:.2f}, status={process_status}, "
+                            f"tags={len(results.get('tags_list', []))}, uploaded={success}",
+                            extra={"pin_id": pin_id, "aesthetic_score": results.get("aesthetic_score"),
+                                   "priority_score": round(priority_score, 4), "process_status": process_status,
+                                   "uploaded": success, "latency": round(time.perf_counter() - started, 3)})
+
+                if success:
+                    self.dead_letters.record_success(pin_id)
+                return success
+            finally:
+                # Cleanup
                 self.cleanup_temp_image(image_path)
-                continue
-
-            # Calculate priority
-            priority_score, process_status = self.calculate_final_priority(results)
-
-            # Send results to server
-            success = self.send_results_to_server(pin_id, results, priority_score, process_status)
-
-            # Notify if high priority
-            if priority_score >= 0.8:
-                self.notify_high_priority(pin_id, priority_score)
-
-            # Cleanup
-            self.cleanup_temp_image(image_path)
-
-            if success:
-                processed_count += 1
-
-            # Small delay between images
-            time.sleep(1)
-
-        logger.info(f"Batch complete: {processed_count}/{len(pending_images)} images processed successfully")
-        return processed_count
+                latencies.append(time.perf_counter() - started)
+
+        with ThreadPoolExecutor(config.download_workers, thread_name_prefix="download") as downloads, \
+                ThreadPoolExecutor(config.inflight_prompts, thread_name_prefix="comfyui") as prompts, \
+                ThreadPoolExecutor(config.upload_workers, thread_name_prefix="upload") as uploads:
+
+            def download_stage(image_data: Dict) -> Tuple[Optional[Path], float]:
+                download_start = time.perf_counter()
+                image_path = self.download_image(image_data["image_url"], image_data["pin_id"])
+                return image_path, time.perf_counter() - download_start
+
+            def comfyui_stage(image_data: Dict, download_future):
+                pin_id = image_data["pin_id"]
+                image_path, download_seconds = download_future.result()
+                if not image_path:
+                    return None
+
+                # Clock as if the download had just finished: prefetch wait is not image latency
+                started = time.perf_counter() - download_seconds
+
+                logger.debug(f"Processing image: {pin_id}")
+                results = self.process_image_with_comfyui(image_path, pin_id)
+
+                # Optional delay between images on this prompt slot
+                if config.image_delay:
+                    time.sleep(config.image_delay)
+
+                if not results:
+                    self.cleanup_temp_image(image_path)
+                    return None
+                return uploads.submit(upload_stage, image_data, image_path, results, started)
+
+            stage_futures = []
+            for image_data in images:
+                download_future = downloads.submit(download_stage, image_data)
+                stage_futures.append(prompts.submit(comfyui_stage, image_data, download_future))
+
+            upload_futures = [f.result() for f in stage_futures]
+            processed = sum(1 for f in upload_futures if f is not None and f.result())
+
+        # One dead-letter write per batch instead of one per failure
+        self.dead_letters.flush()
+
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            "images": len(images),
+            "processed": processed,
+            "throughput": processed / elapsed if elapsed > 0 else 0.0,
+            "p95_latency": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+            "seconds": elapsed,
+        }
 
-    def run_continuous(self, batch_size: int = 10, sleep_minutes: int = 5):
-        """Run bridge in continuous mode"""
+    def run_continuous(self, batch_size: int = 10, sleep_minutes: int = 5, autotune: Optional[Dict] = None):
+        """Run bridge in continuous mode (re-tuning on throughput drift when autotune options are given)"""
         logger.info("Starting FashionXG Bridge in continuous mode")
         logger.info(f"Batch size: {batch_size}, Sleep interval: {sleep_minutes} minutes")
 
+        error_backoff = RetryPolicy(base_delay=5.0, max_delay=600.0)
+        consecutive_errors = 0
+
         while True:
             try:
                 processed = self.process_batch(batch_size)
+                consecutive_errors = 0
+
+                # Tune once images are available, then again whenever throughput drifts
+                if autotune and processed and (self.autotuner is None or
+                                               self.autotuner.observe(self.last_batch_stats["throughput"],
+                                                                      self.last_batch_stats["images"])):
+                    self.run_autotune(**autotune)
 
                 if processed == 0:
                     logger.info(f"No images processed, sleeping for {sleep_minutes} minutes...")
                 else:
                     logger.info(f"Processed {processed} images, sleeping for {sleep_minutes} minutes...")
 
-                time.sleep(sleep_minutes * 60)
+                self.sleep_keeping_warm(sleep_minutes * 60)
 
             except KeyboardInterrupt:
                 logger.info("Received interrupt signal, shutting down...")
                 break
             except Exception as e:
+                consecutive_errors += 1
+                delay = max(1.0, error_backoff.delay(consecutive_errors))
                 logger.error(f"Error in main loop: {e}")
-                logger.info("Sleeping for 1 minute before retry...")
-                time.sleep(60)
+                logger.info(f"Sleeping for {delay:.0f}s before retry ({consecutive_errors} consecutive errors)...")
+                time.sleep(delay)
 
 
 def main():
     """Main entry point"""
     import argparse
-    global SERVER_URL
+    global SERVER_URL, PROFILES_DIR, STORE_PATH, NOTIFIER, KEEP_WARM_MINUTES, SEND_PROFILE_SCORES
 
     parser = argparse.ArgumentParser(description="FashionXG ComfyUI Bridge")
     parser.add_argument("--batch-size", type=int, default=10, help="Number of images to process per batch")
     parser.add_argument("--sleep", type=int, default=5, help="Sleep interval in minutes between batches")
     parser.add_argument("--once", action="store_true", help="Process one batch and exit")
     parser.add_argument("--server", type=str, default=SERVER_URL, help="Server URL")
+    parser.add_argument("--profiles-dir", type=str, default=PROFILES_DIR,
+                        help="Directory of additional <designer>.json preference profiles")
+    parser.add_argument("--send-profile-scores", action="store_true", default=SEND_PROFILE_SCORES,
+                        help="Upload per-profile scores as profile_scores (the server must accept the extra field)")
+    parser.add_argument("--store", type=str, default=STORE_PATH,
+                        help="Local SQLite results store (empty string to disable)")
+    parser.add_argument("--notifier", type=str, default=NOTIFIER,
+                        help="Notification backend: auto, macos, dbus, webhook, stdout, none")
+    parser.add_argument("--autotune", action="store_true",
+                        help="Tune download/prompt/upload concurrency at startup and re-tune on throughput drift")
+    parser.add_argument("--probe-size", type=int, default=8, help="Images per autotune probe window")
+    parser.add_argument("--latency-bound", type=float, default=None,
+                        help="Maximum p95 per-image latency (seconds) accepted by the autotuner")
+    parser.add_argument("--synthetic-probe", type=str, default=None, metavar="IMAGE_URL",
+                        help="Autotune with this image instead of the live pending feed (nothing is uploaded)")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip the ComfyUI model warm-up prompt at startup")
+    parser.add_argument("--keep-warm", type=int, default=KEEP_WARM_MINUTES,
+                        help="Re-warm ComfyUI after this many idle minutes (0 disables)")
+    parser.add_argument("--log-level", type=str, default="INFO", help="Root log level")
+    parser.add_argument("--log-levels", type=str, default="",
+                        help="Per-module levels, e.g. comfy_bridge=DEBUG,resilience=WARNING")
+    parser.add_argument("--log-file", type=str, default=LOG_FILE,
+                        help="JSON-lines log file, rotated by size and age (empty string to disable)")
+    parser.add_argument("--memory-profile", action="store_true",
+                        help="Log tracemalloc allocation growth, RSS and open fds/sockets periodically and on SIGUSR1")
+    parser.add_argument("--memory-interval", type=float, default=30,
+                        help="Minutes between --memory-profile reports (0 = only on SIGUSR1)")
+    parser.add_argument("--memory-top", type=int, default=10,
+                        help="Allocation sites listed per --memory-profile report")
+    parser.add_argument("--rescore", action="store_true",
+                        help="Re-score already-tagged images with the current profiles and exit")
+    parser.add_argument("--rescore-source", choices=["server", "store"], default="server",
+                        help="Where --rescore reads tagged images from")
+    parser.add_argument("--rescore-page-size", type=int, default=1000, help="Images per --rescore batch")
+    parser.add_argument("--dry-run", action="store_true", help="With --rescore: report changes without pushing")
 
     args = parser.parse_args()
 
+    configure_logging(args.log_level, args.log_file or None, parse_module_levels(args.log_levels))
+
     # Update global config
     SERVER_URL = args.server
-
-    # Create bridge instance
-    bridge = FashionXGBridge()
+    PROFILES_DIR = args.profiles_dir
+    STORE_PATH = args.store
+    NOTIFIER = args.notifier
+    KEEP_WARM_MINUTES = args.keep_warm
+    SEND_PROFILE_SCORES = args.send_profile_scores
+
+    if args.rescore:
+        # No ComfyUI needed: only profiles, the server and (optionally) the local store
+        from rescore import BulkRescorer
+        store = ResultsStore(STORE_PATH) if STORE_PATH else None
+        if args.rescore_source == "store" and not store:
+            parser.error("--rescore-source store requires --store")
+        rescorer = BulkRescorer(ProfileSet(discover_profiles(PREFERENCE_FILE, PROFILES_DIR)), SERVER_URL,
+                                store, page_size=args.rescore_page_size, dry_run=args.dry_run)
+        rescorer.run(args.rescore_source)
+        return
+
+    # Create bridge instance (fails fast on a missing or invalid workflow)
+    try:
+        bridge = FashionXGBridge()
+    except WorkflowError as e:
+        logger.error(f"Cannot start bridge: {e}")
+        raise SystemExit(1)
+
+    monitor = None
+    if args.memory_profile:
+        monitor = MemoryMonitor(args.memory_interval * 60, top=args.memory_top).start()
+
+    # Load models in the background while the first batch is fetched and downloaded
+    if not args.no_warmup:
+        bridge.warm_up("startup")
+
+    autotune = None
+    if args.autotune:
+        autotune = {"probe_size": args.probe_size, "latency_bound": args.latency_bound,
+                    "synthetic_url": args.synthetic_probe}
+        bridge.run_autotune(**autotune)
 
     if args.once:
         logger.info("Running in single-batch mode")
         bridge.process_batch(args.batch_size)
     else:
-        bridge.run_continuous(args.batch_size, args.sleep)
+        bridge.run_continuous(args.batch_size, args.sleep, autotune)
+    bridge.close()
+
+    if monitor:
+        monitor.report()
+        monitor.stop()
 
 
 if __name__ == "__main__":
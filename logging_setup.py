@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+FashionXG Logging Setup
+Non-blocking logging: records go through a QueueHandler to a background
+QueueListener that writes compact JSON lines to a size- and time-rotated file
+and human-readable lines to the console. Each script calls configure_logging
+from main() so importing a module never installs handlers.
+"""
+
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+from typing import Dict, Optional
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per line: ts, level, logger, msg (with any traceback), plus `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates when the file exceeds max_bytes or is older than max_age seconds"""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, max_age: float):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_age = max_age
+        self.rollover_at = time.time() + max_age if max_age else float("inf")
+
+    def shouldRollover(self, record: logging.LogRecord) -> int:
+        if time.time() >= self.rollover_at:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.stream.tell() > 0:
+                return 1
+            self.rollover_at = time.time() + self.max_age
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.max_age:
+            self.rollover_at = time.time() + self.max_age
+
+
+def parse_module_levels(spec: Optional[str]) -> Dict[str, str]:
+    """Parse "comfy_bridge=DEBUG,resilience=WARNING" into {logger: level}"""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: str = "INFO", log_file: Optional[str] = None,
+                      module_levels: Optional[Dict[str, str]] = None, console: bool = True,
+                      max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                      max_age_hours: float = 24.0):
+    """
+    Install a QueueHandler on the root logger and start the background listener.
+    Safe to call again (e.g. after CLI parsing): the previous listener is stopped first.
+    """
+    global _listener
+
+    sinks = []
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        sinks.append(stream)
+    if log_file:
+        file_handler = SizeAndTimeRotatingFileHandler(log_file, max_bytes, backup_count, max_age_hours * 3600)
+        file_handler.setFormatter(JsonLinesFormatter())
+        sinks.append(file_handler)
+
+    if _listener:
+        _listener.stop()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    log_queue: "queue.Queue" = queue.Queue(-1)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level.upper())
+    for name, module_level in (module_levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *sinks, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+FashionXG Memory Monitor
+Opt-in leak hunting for the long-running bridge: periodic tracemalloc snapshots
+reporting the top allocation growth since the previous report, plus RSS, open
+file / socket counts and live threads. A report can also be requested at any
+time with `kill -USR1 <pid>`.
+"""
+
+import os
+import gc
+import sys
+import stat
+import time
+import signal
+import logging
+import threading
+import tracemalloc
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REPORT_SIGNAL = getattr(signal, "SIGUSR1", None)  # not available on Windows
+MB = 1024 * 1024
+
+
+def process_rss() -> int:
+    """
+    Resident set size in bytes: current RSS via psutil or /proc when available,
+    otherwise the peak RSS from getrusage (still rises monotonically under a leak)
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+def open_descriptors() -> Dict[str, int]:
+    """Open file descriptors by kind: regular files, sockets, other (pipes, devices, directories)"""
+    fd_dir = "/proc/self/fd" if os.path.isdir("/proc/self/fd") else "/dev/fd"
+    counts = {"files": 0, "sockets": 0, "other": 0}
+    for name in os.listdir(fd_dir):
+        try:
+            mode = os.fstat(int(name)).st_mode
+        except (OSError, ValueError):
+            continue  # the descriptor listdir itself used, already closed
+
+        if stat.S_ISSOCK(mode):
+            counts["sockets"] += 1
+        elif stat.S_ISREG(mode):
+            counts["files"] += 1
+        else:
+            counts["other"] += 1
+
+    counts["total"] = sum(counts.values())
+    return counts
+
+
+def growth_per_hour(samples: List[Dict], key: str) -> float:
+    """Least-squares slope of samples[key] over samples["time"], per hour"""
+    if len(samples) < 2:
+        return 0.0
+
+    times = [s["time"] for s in samples]
+    values = [s[key] for s in samples]
+    mean_t = sum(times) / len(times)
+    mean_v = sum(values) / len(values)
+    variance = sum((t - mean_t) ** 2 for t in times)
+    if variance == 0:
+        return 0.0
+    return sum((t - mean_t) * (v - mean_v) for t, v in zip(times, values)) / variance * 3600
+
+
+class MemoryMonitor:
+    """
+    Samples process memory and descriptors on a background thread every
+    `interval` seconds (0 = only when signalled). With `trace=True` tracemalloc
+    runs with `frames` frames per allocation, and each report lists the `top`
+    source lines whose allocations grew the most since the previous report.
+    """
+
+    def __init__(self, interval: float = 1800.0, top: int = 10, frames: int = 1,
+                 trace: bool = True, max_samples: int = 10000):
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.trace = trace
+        self.samples: deque = deque(maxlen=max_samples)
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, install_signal: bool = True) -> "MemoryMonitor":
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            self._previous = self._snapshot()
+
+        # signal.signal only works from the main thread
+        if install_signal and REPORT_SIGNAL and threading.current_thread() is threading.main_thread():
+            signal.signal(REPORT_SIGNAL, self._on_signal)
+
+        self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+        self._thread.start()
+
+        every = f"every {self.interval / 60:g} min" if self.interval > 0 else "on signal only"
+        logger.info(f"Memory profiling enabled ({every}"
+                    f"{f', kill -USR1 {os.getpid()} for a report now' if REPORT_SIGNAL else ''}"
+                    f"{', tracemalloc on' if self.trace else ''})")
+        self.sample()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        if self.trace and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _on_signal(self, signum, frame):
+        # Runs on the main thread between bytecodes: hand the work to the monitor thread
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval if self.interval > 0 else None)
+            if self._stop.is_set():
+                return
+            self._wake.clear()
+            try:
+                self.report()
+            except Exception as e:
+                logger.error(f"Memory report failed: {e}")
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def sample(self, collect: bool = False) -> Dict:
+        """Record RSS, descriptor and thread counts (and traced memory); `collect` runs gc first"""
+        if collect:
+            gc.collect()
+
+        fds = open_descriptors()
+        entry = {
+            "time": time.time(),
+            "rss": process_rss(),
+            "fds": fds["total"],
+            "files": fds["files"],
+            "sockets": fds["sockets"],
+            "threads": threading.active_count(),
+        }
+        if tracemalloc.is_tracing():
+            entry["traced"], entry["traced_peak"] = tracemalloc.get_traced_memory()
+
+        self.samples.append(entry)
+        return entry
+
+    def report(self) -> Dict:
+        """Log a sample and, when tracing, the top allocation growth since the last report"""
+        with self._lock:
+            entry = self.sample(collect=True)
+            traced = f", traced {entry['traced'] / MB:.1f} MB" if "traced" in entry else ""
+            logger.info(f"Memory: RSS {entry['rss'] / MB:.1f} MB{traced}, {entry['fds']} fds "
+                        f"({entry['files']} files, {entry['sockets']} sockets), {entry['threads']} threads",
+                        extra={"memory": entry})
+
+            if len(self.samples) > 2:
+                history = list(self.samples)
+                logger.info(f"Memory trend: RSS {growth_per_hour(history, 'rss') / MB:+.1f} MB/h, "
+                            f"fds {growth_per_hour(history, 'fds'):+.1f}/h over {len(history)} samples")
+
+            if tracemalloc.is_tracing():
+                snapshot = self._snapshot()
+                if self._previous is not None:
+                    grown = [s for s in snapshot.compare_to(self._previous, "lineno") if s.size_diff > 0]
+                    for stat_diff in grown[:self.top]:
+                        logger.info(f"  {stat_diff}")
+                self._previous = snapshot
+
+            return entry
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+FashionXG Notifications
+Background dispatcher that coalesces high-priority alerts into digests and
+rate-limits them, with pluggable macOS / D-Bus / webhook / stdout backends
+"""
+
+import os
+import sys
+import time
+import queue
+import shutil
+import logging
+import threading
+import subprocess
+from typing import List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.getenv("FASHIONXG_WEBHOOK_URL", "")
+NOTIFICATION_TITLE = "FashionXG: High Priority Image Found"
+
+
+class HighPriorityEvent(NamedTuple):
+    pin_id: str
+    score: float
+    timestamp: float
+
+
+class NotificationBackend:
+    """Delivers one notification; delivery errors are raised and logged by the dispatcher"""
+
+    name = "base"
+
+    def send(self, title: str, subtitle: str, message: str):
+        raise NotImplementedError
+
+
+class MacOSBackend(NotificationBackend):
+    """Notification Center via osascript (arguments passed without a shell)"""
+
+    name = "macos"
+    SCRIPT = 'on run argv\ndisplay notification (item 3 of argv) with title (item 1 of argv) subtitle (item 2 of argv)\nend run'
+
+    def send(self, title: str, subtitle: str, message: str):
+        subprocess.run(["osascript", "-e", self.SCRIPT, title, subtitle, message],
+                       check=True, timeout=10, capture_output=True)
+
+
+class DBusBackend(NotificationBackend):
+    """Desktop notification through notify-send (freedesktop D-Bus)"""
+
+    name = "dbus"
+
+    def send(self, title: str, subtitle: str, message: str):
+        subprocess.run(["notify-send", "--app-name=FashionXG", title, f"{subtitle}\n{message}"],
+                       check=True, timeout=10, capture_output=True)
+
+
+class WebhookBackend(NotificationBackend):
+    """JSON POST to a webhook (Slack/Discord-compatible "text" field)"""
+
+    name = "webhook"
+
+    def __init__(self, url: str = WEBHOOK_URL):
+        if not url:
+            raise ValueError("Webhook backend requires FASHIONXG_WEBHOOK_URL")
+        self.url = url
+
+    def send(self, title: str, subtitle: str, message: str):
+        import requests
+        response = requests.post(self.url, json={"text": f"*{title}*\n{subtitle}\n{message}",
+                                                 "title": title, "subtitle": subtitle, "message": message},
+                                 timeout=(5, 10))
+        response.raise_for_status()
+
+
+class StdoutBackend(NotificationBackend):
+    name = "stdout"
+
+    def send(self, title: str, subtitle: str, message: str):
+        print(f"[notification] {title} | {subtitle} | {message}", flush=True)
+
+
+class NullBackend(NotificationBackend):
+    name = "none"
+
+    def send(self, title: str, subtitle: str, message: str):
+        pass
+
+
+class RecordingBackend(NotificationBackend):
+    """Test double: keeps every delivered notification in memory"""
+
+    name = "recording"
+
+    def __init__(self):
+        self.sent: List[tuple] = []
+        self.delivered = threading.Event()
+
+    def send(self, title: str, subtitle: str, message: str):
+        self.sent.append((title, subtitle, message))
+        self.delivered.set()
+
+
+BACKENDS = {
+    "macos": MacOSBackend,
+    "dbus": DBusBackend,
+    "webhook": WebhookBackend,
+    "stdout": StdoutBackend,
+    "none": NullBackend,
+}
+
+
+def create_backend(name: str = "auto") -> NotificationBackend:
+    """Build a backend by name; "auto" picks macOS, then D-Bus, then stdout"""
+    if name == "auto":
+        if sys.platform == "darwin" and shutil.which("osascript"):
+            name = "macos"
+        elif shutil.which("notify-send") and os.getenv("DBUS_SESSION_BUS_ADDRESS"):
+            name = "dbus"
+        else:
+            name = "stdout"
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown notifier '{name}', choose from: auto, {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+class NotificationDispatcher:
+    """
+    Queues events off the hot path. A background thread waits `coalesce_delay`
+    after the first event so a burst is sent as one digest, and never sends more
+    than one notification per `min_interval` seconds; events arriving during the
+    cooldown are folded into the next digest.
+    """
+
+    _STOP = object()
+
+    def __init__(self, backend: NotificationBackend, coalesce_delay: float = 5.0,
+                 min_interval: float = 60.0, max_queue: int = 1000):
+        self.backend = backend
+        self.coalesce_delay = coalesce_delay
+        self.min_interval = min_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._last_sent = float("-inf")
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    def notify(self, pin_id: str, score: float):
+        """Enqueue a high-priority event; never blocks the caller"""
+        try:
+            self._queue.put_nowait(HighPriorityEvent(pin_id, score, time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 10.0):
+        """Flush anything pending (ignoring the rate limit) and stop the worker"""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        pending: List[HighPriorityEvent] = []
+        flush_at = 0.0
+
+        while True:
+            wait = max(0.0, flush_at - time.monotonic()) if pending else None
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            if item is self._STOP:
+                if pending:
+                    self._deliver(pending)
+                return
+
+            if item is not None:
+                if not pending:
+                    flush_at = max(time.monotonic() + self.coalesce_delay, self._last_sent + self.min_interval)
+                pending.append(item)
+
+            if pending and time.monotonic() >= flush_at:
+                self._deliver(pending)
+                pending = []
+
+    def _deliver(self, events: List[HighPriorityEvent]):
+        best = max(events, key=lambda e: e.score)
+        if len(events) == 1:
+            subtitle, message = f"Pin ID: {best.pin_id}", f"Score: {best.score:.2f}"
+        else:
+            span = max(1, int(time.time() - events[0].timestamp))
+            period = f"{span // 60} min" if span >= 120 else f"{span}s"
+            subtitle = f"{len(events)} high-priority images in the last {period}"
+            message = f"Best: {best.pin_id} ({best.score:.2f})"
+
+        self._last_sent = time.monotonic()
+        try:
+            self.backend.send(NOTIFICATION_TITLE, subtitle, message)
+            logger.info(f"Sent {self.backend.name} notification: {subtitle}")
+        except Exception as e:
+            logger.error(f"Failed to send notification via {self.backend.name}: {e}")
+
+
+def check_dispatcher(coalesce_delay: float = 0.2, min_interval: float = 0.6) -> List[str]:
+    """Exercise coalescing and rate limiting against RecordingBackend; returns failure messages"""
+    failures = []
+    backend = RecordingBackend()
+    dispatcher = NotificationDispatcher(backend, coalesce_delay=coalesce_delay, min_interval=min_interval)
+
+    # A burst becomes one digest naming the best image
+    for i, score in enumerate([0.81, 0.93, 0.85]):
+        dispatcher.notify(f"pin-{i}", score)
+    if backend.sent:
+        failures.append("burst was delivered before coalesce_delay")
+    if not backend.delivered.wait(coalesce_delay * 5):
+        failures.append("burst was never delivered")
+    elif len(backend.sent) != 1 or "3 high-priority" not in backend.sent[0][1] or "pin-1" not in backend.sent[0][2]:
+        failures.append(f"burst was not coalesced into one digest: {backend.sent}")
+    first_sent = time.monotonic()
+
+    # The next event waits for min_interval after the previous notification
+    backend.delivered.clear()
+    dispatcher.notify("pin-late", 0.9)
+    if backend.delivered.wait(max(0.0, min_interval - coalesce_delay) * 0.5):
+        failures.append("rate limit not applied: second notification sent too early")
+    if not backend.delivered.wait(min_interval * 3):
+        failures.append("rate-limited notification was never delivered")
+    elif time.monotonic() - first_sent < min_interval * 0.9:
+        failures.append("second notification sent before min_interval")
+
+    # close() flushes pending events without waiting for the rate limit
+    backend.delivered.clear()
+    dispatcher.notify("pin-final", 0.88)
+    dispatcher.close(timeout=min_interval * 3)
+    if len(backend.sent) != 3 or "pin-final" not in backend.sent[-1][1]:
+        failures.append(f"close() did not flush the pending event: {backend.sent}")
+    return failures
+
+
+def main():
+    """Check the dispatcher logic or send a test notification"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FashionXG notifications")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("check", help="Verify coalescing and rate limiting (no desktop needed)")
+    send = sub.add_parser("send", help="Send one test notification")
+    send.add_argument("--notifier", type=str, default="auto", help=f"auto, {', '.join(BACKENDS)}")
+
+    args = parser.parse_args()
+
+    if args.command == "check":
+        failures = check_dispatcher()
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        print("Dispatcher check passed" if not failures else f"{len(failures)} check(s) failed")
+        sys.exit(1 if failures else 0)
+
+    backend = create_backend(args.notifier)
+    backend.send(NOTIFICATION_TITLE, "Pin ID: test", "Score: 0.95")
+    print(f"Sent test notification via {backend.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+FashionXG Multi-Profile Scoring
+Stacks several designers' preference profiles into matrices so each image
+(or a batch of images) is scored against all of them in one pass
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Blacklist tags that should be filtered out
+BLACKLIST_TAGS = {'text', 'watermark', 'meme', 'blurry', 'low_quality', 'screenshot'}
+
+# Composite score weights and status thresholds
+AESTHETIC_WEIGHT = 0.4
+SIMILARITY_WEIGHT = 0.4
+TAG_MATCH_WEIGHT = 0.2
+HIGH_PRIORITY_THRESHOLD = 0.8
+MEDIUM_PRIORITY_THRESHOLD = 0.5
+NEUTRAL_SCORE = 0.5
+
+DEFAULT_PROFILE = "default"
+
+
+def load_profile_file(path: Path) -> Dict:
+    """Load one preference profile, returning an empty profile if missing"""
+    if not Path(path).exists():
+        logger.warning(f"Preference file not found: {path}")
+        return {"liked_tags": [], "disliked_tags": [], "liked_vectors": []}
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def discover_profiles(default_file: str, profiles_dir: Optional[str]) -> Dict[str, Dict]:
+    """
+    Load the default profile plus one profile per <name>.json in profiles_dir.
+    Returns {name: profile} with the default profile first.
+    """
+    profiles = {DEFAULT_PROFILE: load_profile_file(Path(default_file))}
+
+    if profiles_dir and Path(profiles_dir).is_dir():
+        for path in sorted(Path(profiles_dir).glob("*.json")):
+            profiles[path.stem] = load_profile_file(path)
+
+    logger.info(f"Loaded {len(profiles)} preference profiles: {list(profiles)}")
+    return profiles
+
+
+def status_for_score(scores: np.ndarray) -> np.ndarray:
+    """Map final scores to process_status (2 archive, 1 review, -1 reject)"""
+    return np.where(scores >= HIGH_PRIORITY_THRESHOLD, 2,
+                    np.where(scores >= MEDIUM_PRIORITY_THRESHOLD, 1, -1))
+
+
+class ProfileSet:
+    """Named preference profiles stacked into tag and vector matrices"""
+
+    def __init__(self, profiles: Dict[str, Dict]):
+        self.names: List[str] = list(profiles)
+        self.profiles = profiles
+
+        # Tag vocabulary shared by all profiles
+        vocab = set()
+        for profile in profiles.values():
+            vocab.update(profile.get("liked_tags", []))
+            vocab.update(profile.get("disliked_tags", []))
+        self.vocab: Dict[str, int] = {tag: i for i, tag in enumerate(sorted(vocab))}
+
+        # (profiles x vocab) binary matrices
+        self.liked = np.zeros((len(self.names), len(self.vocab)), dtype=np.float64)
+        self.disliked = np.zeros_like(self.liked)
+        for p, name in enumerate(self.names):
+            for tag in profiles[name].get("liked_tags", []):
+                self.liked[p, self.vocab[tag]] = 1.0
+            for tag in profiles[name].get("disliked_tags", []):
+                self.disliked[p, self.vocab[tag]] = 1.0
+        self.liked_counts = self.liked.sum(axis=1)
+
+        self._stack_vectors()
+
+    def _stack_vectors(self):
+        """Stack every profile's liked vectors into one normalised matrix grouped by profile"""
+        rows, owners = [], []
+        dim = None
+        for p, name in enumerate(self.names):
+            for vector in self.profiles[name].get("liked_vectors", []):
+                if dim is None:
+                    dim = len(vector)
+                if len(vector) != dim:
+                    logger.warning(f"Profile {name}: skipping vector of dim {len(vector)} (expected {dim})")
+                    continue
+                rows.append(vector)
+                owners.append(p)
+
+        self.vector_dim = dim
+        if not rows:
+            self.vectors = np.zeros((0, 0), dtype=np.float64)
+            self.vector_offsets = np.zeros(0, dtype=np.int64)
+            self.vector_profiles = np.zeros(0, dtype=np.int64)
+            return
+
+        vectors = np.asarray(rows, dtype=np.float64)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.maximum(norms, 1e-12)
+
+        # Rows are already grouped by profile: keep segment starts for reduceat
+        owners = np.asarray(owners)
+        self.vector_profiles, self.vector_offsets = np.unique(owners, return_index=True)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def tag_matrix(self, tag_lists: Sequence[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode images' tags against the vocabulary.
+        Returns (images x vocab) matrix and a per-image blacklist mask.
+        """
+        matrix = np.zeros((len(tag_lists), len(self.vocab)), dtype=np.float64)
+        blacklisted = np.zeros(len(tag_lists), dtype=bool)
+        for i, tags in enumerate(tag_lists):
+            tag_set = set(tag.lower() for tag in tags)
+            blacklisted[i] = bool(tag_set & BLACKLIST_TAGS)
+            for tag in tag_set:
+                j = self.vocab.get(tag)
+                if j is not None:
+                    matrix[i, j] = 1.0
+        return matrix, blacklisted
+
+    def tag_match_scores(self, tags: np.ndarray) -> np.ndarray:
+        """(images x profiles) tag match: liked overlap ratio, 0 on any disliked tag"""
+        if not len(self.vocab):
+            return np.full((tags.shape[0], len(self.names)), NEUTRAL_SCORE, dtype=np.float64)
+
+        liked_hits = tags @ self.liked.T
+        disliked_hits = tags @ self.disliked.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.minimum(liked_hits / self.liked_counts, 1.0)
+        scores = np.where(self.liked_counts > 0, ratio, NEUTRAL_SCORE)
+        return np.where((disliked_hits > 0) & (self.liked_counts > 0), 0.0, scores)
+
+    def similarity_scores(self, image_vectors: Sequence[Optional[Sequence[float]]]) -> np.ndarray:
+        """(images x profiles) max cosine similarity to liked vectors, neutral when unavailable"""
+        result = np.full((len(image_vectors), len(self.names)), NEUTRAL_SCORE, dtype=np.float64)
+        if not self.vectors.size:
+            return result
+
+        rows = [i for i, v in enumerate(image_vectors) if v is not None and len(v) == self.vector_dim]
+        if not rows:
+            return result
+
+        queries = np.asarray([image_vectors[i] for i in rows], dtype=np.float64)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        sims = queries @ self.vectors.T
+        best = np.maximum.reduceat(sims, self.vector_offsets, axis=1)
+        result[np.ix_(rows, self.vector_profiles)] = np.clip(best, 0.0, 1.0)
+        return result
+
+    def score_batch(self, tag_lists: Sequence[Sequence[str]], aesthetic_scores: Sequence[float],
+                    image_vectors: Optional[Sequence[Optional[Sequence[float]]]] = None
+                    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score N images against all profiles.
+        Returns (images x profiles) final scores and process statuses.
+        """
+        if image_vectors is None:
+            image_vectors = [None] * len(tag_lists)
+
+        tags, blacklisted = self.tag_matrix(tag_lists)
+        aesthetic = np.asarray(aesthetic_scores, dtype=np.float64)[:, None]
+
+        scores = ((aesthetic / 10.0) * AESTHETIC_WEIGHT
+                  + self.similarity_scores(image_vectors) * SIMILARITY_WEIGHT
+                  + self.tag_match_scores(tags) * TAG_MATCH_WEIGHT)
+        scores[blacklisted] = 0.0
+
+        return scores, status_for_score(scores)
+
+    def score(self, tags: List[str], aesthetic_score: float,
+              image_vector: Optional[List[float]] = None) -> Dict[str, Tuple[float, int]]:
+        """Score a single image against all profiles: {name: (priority_score, process_status)}"""
+        scores, statuses = self.score_batch([tags], [aesthetic_score], [image_vector])
+        return {name: (float(scores[0, p]), int(statuses[0, p])) for p, name in enumerate(self.names)}
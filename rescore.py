@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+FashionXG Bulk Re-scoring
+Re-applies the priority logic to already-tagged images after the preference
+profiles change, without running them through ComfyUI again
+"""
+
+import time
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from profile_scoring import DEFAULT_PROFILE, ProfileSet
+from resilience import SERVER_TIMEOUT, CircuitBreaker, RetryPolicy, call_with_retry, check_response
+from results_store import ResultsStore, load_json_field
+
+logger = logging.getLogger(__name__)
+
+
+class BulkRescorer:
+    """Pages through tagged images, re-scores them in vectorized batches and pushes status changes"""
+
+    def __init__(self, profiles: ProfileSet, server_url: str, store: Optional[ResultsStore] = None,
+                 page_size: int = 1000, dry_run: bool = False):
+        self.profiles = profiles
+        self.server_url = server_url
+        self.store = store
+        self.page_size = page_size
+        self.dry_run = dry_run
+        self.breaker = CircuitBreaker("server", failure_threshold=5, reset_timeout=60)
+        self.retry = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=20.0)
+
+    def iter_server_pages(self) -> Iterator[List[Dict]]:
+        """
+        Yield pages of tagged images from /api/images/processed.
+        `page`/`limit` are assumed; a server that ignores them returns the full
+        list every time, which is detected by the repeated pin_ids and stops the loop.
+        """
+        page = 1
+        seen = 0
+        previous_pins: List[str] = []
+        while True:
+            def fetch():
+                response = requests.get(f"{self.server_url}/api/images/processed",
+                                        params={"page": page, "limit": self.page_size},
+                                        timeout=SERVER_TIMEOUT)
+                check_response(response)
+                return response.json()
+
+            data = call_with_retry(fetch, self.breaker, self.retry,
+                                   retry_on=(requests.RequestException,), description=f"fetch page {page}")
+            # Accept both a bare list and {"images": [...]}
+            images = data.get("images", []) if isinstance(data, dict) else data
+            if not images:
+                return
+
+            pins = [image.get("pin_id") for image in images]
+            if pins == previous_pins:
+                logger.warning(f"Page {page} repeats page {page - 1}: server ignores paging, stopping")
+                return
+            previous_pins = pins
+
+            yield images
+            seen += len(images)
+            if len(images) < self.page_size:
+                return
+            if isinstance(data, dict) and isinstance(data.get("total"), int) and seen >= data["total"]:
+                return
+            page += 1
+
+    def iter_store_pages(self) -> Iterator[List[Dict]]:
+        """Yield pages of tagged images from the local results store"""
+        yield from self.store.iter_pages(self.page_size)
+
+    def push_status_changes(self, changes: Dict[int, List[str]]):
+        """Send changed statuses, one batch-update-status call per new status"""
+        for status, pin_ids in changes.items():
+            def push():
+                response = requests.post(f"{self.server_url}/api/images/batch-update-status",
+                                         json={"pin_ids": pin_ids, "process_status": status},
+                                         timeout=SERVER_TIMEOUT)
+                check_response(response)
+
+            call_with_retry(push, self.breaker, self.retry, retry_on=(requests.RequestException,),
+                            description=f"push {len(pin_ids)} status={status} updates")
+
+    def rescore_page(self, images: List[Dict]) -> Tuple[Dict[int, List[str]], List[Tuple]]:
+        """
+        Score one page against all profiles.
+        Returns {new_status: [pin_id, ...]} for changed rows, and score rows for the local store.
+        """
+        # Status 0 means not tagged yet: nothing to re-score
+        images = [image for image in images if image.get("pin_id") and image.get("process_status") != 0]
+        tag_lists = [load_json_field(image.get("tags_list"), []) for image in images]
+        aesthetic = [image.get("aesthetic_score") or 0.0 for image in images]
+        vectors = [load_json_field(image.get("clip_vector"), None) for image in images]
+
+        scores, statuses = self.profiles.score_batch(tag_lists, aesthetic, vectors)
+        default = self.profiles.names.index(DEFAULT_PROFILE)
+
+        changes: Dict[int, List[str]] = {}
+        for i, image in enumerate(images):
+            new_status = int(statuses[i, default])
+            if image.get("process_status") != new_status:
+                changes.setdefault(new_status, []).append(image["pin_id"])
+
+        store_updates = [
+            (image["pin_id"], float(scores[i, default]), int(statuses[i, default]),
+             {name: (float(scores[i, p]), int(statuses[i, p])) for p, name in enumerate(self.profiles.names)})
+            for i, image in enumerate(images)
+        ]
+        return changes, store_updates
+
+    def run(self, source: str = "server") -> Dict[str, float]:
+        """Re-score every tagged image from `source` ("server" or "store")"""
+        pages = self.iter_store_pages() if source == "store" else self.iter_server_pages()
+
+        total = changed = 0
+        start = time.perf_counter()
+        for images in pages:
+            changes, store_updates = self.rescore_page(images)
+            page_changed = sum(len(pin_ids) for pin_ids in changes.values())
+
+            if not self.dry_run:
+                # Push first so a failed push is detected again on the next run
+                if changes:
+                    self.push_status_changes(changes)
+                if self.store:
+                    self.store.update_scores(store_updates)
+
+            # Only rows that were actually scored (untagged and malformed ones are dropped)
+            total += len(store_updates)
+            changed += page_changed
+            elapsed = time.perf_counter() - start
+            logger.info(f"Rescored {total} images ({changed} status changes) - "
+                        f"{total / max(elapsed, 1e-9):.0f} images/s")
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Rescore complete: {total} images, {changed} changed{' (dry run)' if self.dry_run else ''}, "
+                    f"{elapsed:.1f}s")
+        return {"total": total, "changed": changed, "seconds": elapsed}
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+FashionXG Resilience Helpers
+Retries with exponential backoff and jitter, per-endpoint circuit breakers
+and a dead-letter list for pins that keep failing
+"""
+
+import json
+import time
+import random
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# (connect, read) timeouts in seconds for HTTP calls
+SERVER_TIMEOUT = (5, 30)
+DOWNLOAD_TIMEOUT = (5, 30)
+COMFYUI_TIMEOUT = 10
+
+DEAD_LETTER_FILE = "dead_letter.json"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open"""
+
+
+class PermanentError(RuntimeError):
+    """Failure that retrying will not fix (e.g. HTTP 404); never retried, and not a breaker failure"""
+
+
+def check_response(response):
+    """raise_for_status, but raise PermanentError for client errors that retrying won't fix"""
+    if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+        raise PermanentError(f"HTTP {response.status_code} for {response.url}")
+    response.raise_for_status()
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Sleep before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint breaker: opens after `failure_threshold` consecutive failures,
+    rejects calls for `reset_timeout` seconds, then lets exactly one trial call
+    through; other callers are rejected until the trial records its outcome
+    (or the trial has been outstanding for `reset_timeout` seconds)
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = self.CLOSED
+        self.trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _trial_pending(self, now: float) -> bool:
+        return self.trial_started is not None and now - self.trial_started < self.reset_timeout
+
+    def allow(self) -> bool:
+        """True if the caller may make the call; in half-open state only the trial caller gets True"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.trial_started = None
+
+            if self.state == self.HALF_OPEN:
+                if self._trial_pending(now):
+                    return False
+                self.trial_started = now
+                logger.info(f"Circuit {self.name} half-open, allowing trial call")
+            return True
+
+    def blocked(self) -> bool:
+        """True while allow() would refuse, without claiming the half-open trial"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                return now - self.opened_at < self.reset_timeout
+            return self.state == self.HALF_OPEN and self._trial_pending(now)
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a trial call through"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.failures = 0
+            self.state = self.CLOSED
+            self.trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit {self.name} open after {self.failures} failures, "
+                                   f"pausing calls for {self.reset_timeout:.0f}s")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self.trial_started = None
+
+
+def call_with_retry(func: Callable[[], T], breaker: Optional[CircuitBreaker] = None,
+                    policy: Optional[RetryPolicy] = None,
+                    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+                    description: str = "call") -> T:
+    """
+    Run an idempotent call with retries, backoff and an optional circuit breaker.
+    Raises CircuitOpenError without calling func when the breaker is open,
+    otherwise re-raises the last error once attempts are exhausted.
+    """
+    policy = policy or RetryPolicy()
+
+    for attempt in range(1, policy.max_attempts + 1):
+        if breaker and not breaker.allow():
+            raise CircuitOpenError(f"Circuit {breaker.name} is open, skipping {description}")
+
+        try:
+            result = func()
+        except PermanentError:
+            # The endpoint answered; only the request itself is bad
+            if breaker:
+                breaker.record_success()
+            raise
+        except retry_on as e:
+            if breaker:
+                breaker.record_failure()
+            if attempt == policy.max_attempts or (breaker and breaker.blocked()):
+                raise
+            delay = policy.delay(attempt)
+            logger.warning(f"{description} failed (attempt {attempt}/{policy.max_attempts}): {e}, "
+                           f"retrying in {delay:.1f}s")
+            time.sleep(delay)
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
+
+
+class DeadLetterList:
+    """
+    Failure counts per pin, persisted so poisoned pins stay skipped across restarts.
+    Only content-level failures (4xx, ComfyUI execution errors) should be recorded;
+    a dead-lettered pin gets another chance once `ttl` seconds have passed.
+    Failure counts below the limit are forgotten after `failure_window` seconds and
+    at most `max_entries` are kept. Changes are written by flush(), not per failure.
+    """
+
+    def __init__(self, path: str = DEAD_LETTER_FILE, max_failures: int = 3, ttl: float = 7 * 86400,
+                 failure_window: float = 86400, max_entries: int = 10000):
+        self.path = Path(path)
+        self.max_failures = max_failures
+        self.ttl = ttl
+        self.failure_window = failure_window
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._mtime = 0.0
+        self._dirty = False
+        self.entries: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+            self._mtime = self.path.stat().st_mtime
+        except ValueError as e:
+            logger.error(f"Ignoring unreadable dead-letter file {self.path}: {e}")
+
+    def _save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+        tmp_path.replace(self.path)
+        self._mtime = self.path.stat().st_mtime
+        self._dirty = False
+
+    def _prune(self):
+        """Drop expired dead entries and stale failure counts, then cap the size (oldest counts first)"""
+        now = time.time()
+        for pin_id, entry in list(self.entries.items()):
+            if self._expired(entry) if entry["dead"] else now - entry.get("last_failed_at", 0) >= self.failure_window:
+                del self.entries[pin_id]
+        excess = len(self.entries) - self.max_entries
+        if excess > 0:
+            oldest = sorted(self.entries, key=lambda pin_id: (self.entries[pin_id]["dead"],
+                                                              self.entries[pin_id].get("last_failed_at", 0)))
+            for pin_id in oldest[:excess]:
+                del self.entries[pin_id]
+
+    def flush(self):
+        """Prune and write the file if anything changed since the last write"""
+        with self._lock:
+            if self._dirty:
+                self._prune()
+                self._save()
+
+    def refresh(self):
+        """Reload the file if another process (e.g. `resilience.py clear`) changed it"""
+        with self._lock:
+            if not self.path.exists():
+                if self._mtime:
+                    self.entries, self._mtime = {}, 0.0
+            elif self.path.stat().st_mtime != self._mtime:
+                self._load()
+
+    def _expired(self, entry: Dict) -> bool:
+        return time.time() - entry.get("dead_at", entry.get("last_failed_at", 0)) >= self.ttl
+
+    def is_dead(self, pin_id: str) -> bool:
+        entry = self.entries.get(pin_id)
+        return bool(entry and entry.get("dead") and not self._expired(entry))
+
+    def record_failure(self, pin_id: str, stage: str, error, permanent: bool = False) -> bool:
+        """Count a failure; returns True if the pin is now dead-lettered"""
+        with self._lock:
+            entry = self.entries.get(pin_id)
+            if entry is None or (entry["dead"] and self._expired(entry)):
+                entry = self.entries[pin_id] = {"failures": 0, "dead": False}
+            entry["failures"] += 1
+            entry["stage"] = stage
+            entry["last_error"] = str(error)[:500]
+            entry["last_failed_at"] = time.time()
+            if (permanent or entry["failures"] >= self.max_failures) and not entry["dead"]:
+                entry["dead"] = True
+                entry["dead_at"] = entry["last_failed_at"]
+                logger.error(f"Dead-lettering {pin_id} after {entry['failures']} failures ({stage}: {error})")
+            self._dirty = True
+            return entry["dead"]
+
+    def clear(self, pin_ids: Optional[List[str]] = None) -> int:
+        """Forget the given pins (all pins when None); returns how many entries were removed"""
+        with self._lock:
+            if pin_ids is None:
+                removed, self.entries = len(self.entries), {}
+            else:
+                removed = sum(1 for pin_id in pin_ids if self.entries.pop(pin_id, None) is not None)
+            if removed:
+                self._prune()
+                self._save()
+            return removed
+
+    def record_success(self, pin_id: str):
+        with self._lock:
+            if self.entries.pop(pin_id, None) is not None:
+                self._dirty = True
+
+
+def main():
+    """List or clear dead-lettered pins"""
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Inspect the FashionXG dead-letter list")
+    parser.add_argument("--file", type=str, default=DEAD_LETTER_FILE, help="Dead-letter file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    listing = sub.add_parser("list", help="Show dead-lettered pins")
+    listing.add_argument("--all", action="store_true", help="Also show pins with failures below the limit")
+
+    clear = sub.add_parser("clear", help="Forget pins so the bridge retries them")
+    clear.add_argument("pin_ids", nargs="*", help="Pins to clear")
+    clear.add_argument("--all", action="store_true", help="Clear every entry")
+
+    args = parser.parse_args()
+    dead_letters = DeadLetterList(args.file)
+
+    if args.command == "list":
+        for pin_id, entry in sorted(dead_letters.entries.items(), key=lambda item: item[1].get("last_failed_at", 0)):
+            dead = dead_letters.is_dead(pin_id)
+            if dead or args.all:
+                failed_at = datetime.fromtimestamp(entry.get("last_failed_at", 0)).strftime("%Y-%m-%d %H:%M")
+                print(f"{pin_id}  {'DEAD' if dead else 'failing':7}  {entry['failures']}x  {failed_at}  "
+                      f"{entry.get('stage', '')}: {entry.get('last_error', '')[:80]}")
+    else:
+        if not args.pin_ids and not args.all:
+            parser.error("clear needs pin ids or --all")
+        removed = dead_letters.clear(None if args.all else args.pin_ids)
+        print(f"Cleared {removed} entries from {args.file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+FashionXG Local Results Store
+SQLite index of every processed image (tags, description, scores, statuses)
+so preference building and ad-hoc queries run locally without the server
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from logging_setup import configure_logging
+
+logger = logging.getLogger("results_store")
+
+# Configuration
+SERVER_URL = os.getenv("FASHIONXG_SERVER", "https://design.chermz112.xyz")
+STORE_PATH = os.getenv("FASHIONXG_STORE", "fashionxg_results.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    pin_id TEXT PRIMARY KEY,
+    processed_at REAL NOT NULL,
+    aesthetic_score REAL,
+    priority_score REAL,
+    process_status INTEGER,
+    description TEXT,
+    tags_list TEXT,
+    fashion_tags TEXT,
+    is_nsfw INTEGER DEFAULT 0,
+    clip_vector TEXT,
+    designer_rating INTEGER,
+    uploaded INTEGER DEFAULT 0,
+    image_url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_images_processed_at ON images(processed_at);
+CREATE INDEX IF NOT EXISTS idx_images_aesthetic ON images(aesthetic_score);
+CREATE INDEX IF NOT EXISTS idx_images_priority ON images(priority_score);
+CREATE INDEX IF NOT EXISTS idx_images_status ON images(process_status);
+CREATE INDEX IF NOT EXISTS idx_images_rating ON images(designer_rating);
+
+CREATE TABLE IF NOT EXISTS image_tags (
+    tag TEXT NOT NULL,
+    pin_id TEXT NOT NULL REFERENCES images(pin_id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, pin_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_image_tags_pin ON image_tags(pin_id);
+
+CREATE TABLE IF NOT EXISTS profile_scores (
+    pin_id TEXT NOT NULL REFERENCES images(pin_id) ON DELETE CASCADE,
+    profile TEXT NOT NULL,
+    priority_score REAL,
+    process_status INTEGER,
+    PRIMARY KEY (pin_id, profile)
+);
+CREATE INDEX IF NOT EXISTS idx_profile_scores ON profile_scores(profile, priority_score);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5(pin_id UNINDEXED, description, tags);
+"""
+
+
+def load_json_field(value, default):
+    """Decode a JSON column that the server may return as a string"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return value if value is not None else default
+
+
+class ResultsStore:
+    """Append-only local index of processed images"""
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+        # Stores created before image_url was kept (needed by clip_backfill.py --store)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(images)")}
+        if "image_url" not in columns:
+            self.conn.execute("ALTER TABLE images ADD COLUMN image_url TEXT")
+
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            logger.warning("SQLite FTS5 not available, full-text search disabled")
+            self.has_fts = False
+
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _upsert(self, row: Dict, profile_priorities: Optional[Dict[str, Tuple[float, int]]] = None):
+        """Insert or replace one image row plus its tag and profile index rows (caller commits)"""
+        tags = [t.lower() for t in row.get("tags_list", [])]
+        self.conn.execute(
+            """INSERT INTO images (pin_id, processed_at, aesthetic_score, priority_score, process_status,
+                                   description, tags_list, fashion_tags, is_nsfw, clip_vector,
+                                   designer_rating, uploaded, image_url)
+               VALUES (:pin_id, :processed_at, :aesthetic_score, :priority_score, :process_status,
+                       :description, :tags_list, :fashion_tags, :is_nsfw, :clip_vector,
+                       :designer_rating, :uploaded, :image_url)
+               ON CONFLICT(pin_id) DO UPDATE SET
+                   processed_at = COALESCE(:touched_at, images.processed_at),
+                   aesthetic_score = COALESCE(excluded.aesthetic_score, images.aesthetic_score),
+                   priority_score = COALESCE(excluded.priority_score, images.priority_score),
+                   process_status = COALESCE(excluded.process_status, images.process_status),
+                   description = excluded.description,
+                   tags_list = excluded.tags_list,
+                   fashion_tags = excluded.fashion_tags,
+                   is_nsfw = excluded.is_nsfw,
+                   clip_vector = COALESCE(excluded.clip_vector, images.clip_vector),
+                   designer_rating = COALESCE(excluded.designer_rating, images.designer_rating),
+                   uploaded = MAX(excluded.uploaded, images.uploaded),
+                   image_url = COALESCE(excluded.image_url, images.image_url)""",
+            {
+                "pin_id": row["pin_id"],
+                "processed_at": row.get("processed_at") or time.time(),
+                # Only bridge results move processed_at; imports keep the original date
+                "touched_at": row.get("processed_at"),
+                "aesthetic_score": row.get("aesthetic_score"),
+                "priority_score": row.get("priority_score"),
+                "process_status": row.get("process_status"),
+                "description": row.get("description", ""),
+                "tags_list": json.dumps(row.get("tags_list", [])),
+                "fashion_tags": json.dumps(row.get("fashion_tags", {})),
+                "is_nsfw": int(bool(row.get("is_nsfw", False))),
+                "clip_vector": json.dumps(row["clip_vector"]) if row.get("clip_vector") else None,
+                "designer_rating": row.get("designer_rating"),
+                "uploaded": int(bool(row.get("uploaded", False))),
+                "image_url": row.get("image_url"),
+            })
+
+        self.conn.execute("DELETE FROM image_tags WHERE pin_id = ?", (row["pin_id"],))
+        self.conn.executemany("INSERT OR IGNORE INTO image_tags (tag, pin_id) VALUES (?, ?)",
+                              [(tag, row["pin_id"]) for tag in tags])
+
+        if self.has_fts:
+            self.conn.execute("DELETE FROM images_fts WHERE pin_id = ?", (row["pin_id"],))
+            self.conn.execute("INSERT INTO images_fts (pin_id, description, tags) VALUES (?, ?, ?)",
+                              (row["pin_id"], row.get("description", ""), " ".join(tags)))
+
+        for profile, (score, status) in (profile_priorities or {}).items():
+            self.conn.execute(
+                """INSERT OR REPLACE INTO profile_scores (pin_id, profile, priority_score, process_status)
+                   VALUES (?, ?, ?, ?)""", (row["pin_id"], profile, score, status))
+
+    def record_result(self, pin_id: str, results: Dict, priority_score: float, process_status: int,
+                      profile_priorities: Optional[Dict[str, Tuple[float, int]]] = None,
+                      uploaded: bool = False):
+        """Append one bridge result (called for every processed image)"""
+        row = {
+            "pin_id": pin_id,
+            "processed_at": time.time(),
+            "aesthetic_score": results.get("aesthetic_score"),
+            "priority_score": priority_score,
+            "process_status": process_status,
+            "description": results.get("ai_description", ""),
+            "tags_list": results.get("tags_list", []),
+            "fashion_tags": results.get("fashion_tags", {}),
+            "is_nsfw": results.get("is_nsfw", False),
+            "clip_vector": results.get("clip_vector"),
+            "uploaded": uploaded,
+        }
+        with self._lock:
+            self._upsert(row, profile_priorities)
+            self.conn.commit()
+
+    def import_server_images(self, images: Iterable[Dict]) -> int:
+        """Upsert rows from /api/images/processed (including designer_rating)"""
+        count = 0
+        with self._lock:
+            for image in images:
+                if not image.get("pin_id"):
+                    continue
+                self._upsert({
+                    "pin_id": image["pin_id"],
+                    "aesthetic_score": image.get("aesthetic_score"),
+                    "process_status": image.get("process_status"),
+                    "description": image.get("description") or image.get("ai_description", ""),
+                    "tags_list": load_json_field(image.get("tags_list"), []),
+                    "fashion_tags": load_json_field(image.get("fashion_tags"), {}),
+                    "is_nsfw": image.get("is_nsfw", False),
+                    "clip_vector": load_json_field(image.get("clip_vector"), None),
+                    "designer_rating": image.get("designer_rating"),
+                    "image_url": image.get("image_url"),
+                    "uploaded": True,
+                })
+                count += 1
+            self.conn.commit()
+        return count
+
+    def pending_uploads(self, limit: int = 100) -> List[Tuple[str, Dict, float, int, Dict[str, Tuple[float, int]]]]:
+        """
+        Bridge results the server has not acknowledged yet, oldest first.
+        Returns (pin_id, results, priority_score, process_status, profile_priorities) tuples.
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM images WHERE uploaded = 0 ORDER BY processed_at LIMIT ?", (limit,)).fetchall()
+            pending = []
+            for row in rows:
+                image = self._to_dict(row)
+                profiles = {r["profile"]: (r["priority_score"], r["process_status"]) for r in self.conn.execute(
+                    "SELECT * FROM profile_scores WHERE pin_id = ?", (image["pin_id"],))}
+                results = {
+                    "tags_list": image["tags_list"],
+                    "fashion_tags": image["fashion_tags"],
+                    "ai_description": image["description"],
+                    "aesthetic_score": image["aesthetic_score"],
+                    "is_nsfw": image["is_nsfw"],
+                }
+                pending.append((image["pin_id"], results, image["priority_score"], image["process_status"], profiles))
+            return pending
+
+    def mark_uploaded(self, pin_id: str, uploaded: int = 1):
+        """Set upload state: 1 accepted by the server, -1 rejected permanently"""
+        with self._lock:
+            self.conn.execute("UPDATE images SET uploaded = ? WHERE pin_id = ?", (uploaded, pin_id))
+            self.conn.commit()
+
+    def iter_pages(self, page_size: int = 1000) -> Iterator[List[Dict]]:
+        """Yield all stored images in pages, keyset-paginated by pin_id"""
+        last_pin = ""
+        while True:
+            with self._lock:
+                rows = self.conn.execute("SELECT * FROM images WHERE pin_id > ? ORDER BY pin_id LIMIT ?",
+                                         (last_pin, page_size)).fetchall()
+            if not rows:
+                return
+            yield [self._to_dict(row) for row in rows]
+            last_pin = rows[-1]["pin_id"]
+
+    def update_scores(self, updates: Iterable[Tuple[str, float, int, Dict[str, Tuple[float, int]]]]):
+        """
+        Overwrite priority/status (and per-profile scores) after re-scoring.
+        Pins that are not in the store (e.g. server images from before it existed) are skipped.
+        """
+        with self._lock:
+            for pin_id, priority_score, process_status, profile_priorities in updates:
+                cursor = self.conn.execute("UPDATE images SET priority_score = ?, process_status = ? WHERE pin_id = ?",
+                                           (priority_score, process_status, pin_id))
+                if cursor.rowcount == 0:
+                    continue
+                self.conn.executemany(
+                    """INSERT OR REPLACE INTO profile_scores (pin_id, profile, priority_score, process_status)
+                       VALUES (?, ?, ?, ?)""",
+                    [(pin_id, name, score, status) for name, (score, status) in profile_priorities.items()])
+            self.conn.commit()
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict:
+        image = dict(row)
+        image["tags_list"] = load_json_field(image["tags_list"], [])
+        image["fashion_tags"] = load_json_field(image["fashion_tags"], {})
+        image["clip_vector"] = load_json_field(image["clip_vector"], None)
+        image["is_nsfw"] = bool(image["is_nsfw"])
+        return image
+
+    def query(self, tags: Optional[List[str]] = None, min_aesthetic: Optional[float] = None,
+              min_priority: Optional[float] = None, status: Optional[int] = None,
+              since: Optional[float] = None, text: Optional[str] = None,
+              designer_rating: Optional[int] = None, limit: Optional[int] = 100) -> List[Dict]:
+        """
+        Filter stored images. All tags must be present; text is an FTS5 match
+        over description and tags. Results are newest first.
+        """
+        clauses, params = [], []
+
+        for tag in tags or []:
+            clauses.append("pin_id IN (SELECT pin_id FROM image_tags WHERE tag = ?)")
+            params.append(tag.lower())
+        if min_aesthetic is not None:
+            clauses.append("aesthetic_score >= ?")
+            params.append(min_aesthetic)
+        if min_priority is not None:
+            clauses.append("priority_score >= ?")
+            params.append(min_priority)
+        if status is not None:
+            clauses.append("process_status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("processed_at >= ?")
+            params.append(since)
+        if designer_rating is not None:
+            clauses.append("designer_rating = ?")
+            params.append(designer_rating)
+        if text:
+            if not self.has_fts:
+                raise RuntimeError("Full-text search requires SQLite FTS5")
+            clauses.append("pin_id IN (SELECT pin_id FROM images_fts WHERE images_fts MATCH ?)")
+            params.append(text)
+
+        sql = "SELECT * FROM images"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY processed_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            return [self._to_dict(row) for row in self.conn.execute(sql, params)]
+
+    def rated_images(self, rating: int) -> List[Dict]:
+        """Images with the given designer_rating, for the preference builder"""
+        return self.query(designer_rating=rating, limit=None)
+
+    def tag_counts(self, limit: int = 50) -> List[Tuple[str, int]]:
+        """Most frequent tags across all stored images"""
+        with self._lock:
+            return [(row["tag"], row["n"]) for row in self.conn.execute(
+                "SELECT tag, COUNT(*) AS n FROM image_tags GROUP BY tag ORDER BY n DESC LIMIT ?", (limit,))]
+
+
+def parse_since(value: str) -> float:
+    """Parse '7d', '12h', '30m' or an ISO date into a unix timestamp"""
+    units = {"d": 86400, "h": 3600, "m": 60}
+    if value and value[-1] in units and value[:-1].isdigit():
+        return time.time() - int(value[:-1]) * units[value[-1]]
+
+    from datetime import datetime
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    """Query or sync the local results store"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FashionXG Local Results Store")
+    parser.add_argument("--store", type=str, default=STORE_PATH, help="SQLite store path")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    query = sub.add_parser("query", help="Filter processed images")
+    query.add_argument("--tag", action="append", default=[], help="Required tag (repeatable)")
+    query.add_argument("--min-aesthetic", type=float, help="Minimum aesthetic score (0-10)")
+    query.add_argument("--min-priority", type=float, help="Minimum priority score (0-1)")
+    query.add_argument("--status", type=int, help="process_status (2, 1, -1)")
+    query.add_argument("--since", type=str, help="Only images processed since, e.g. 7d, 12h, 2026-01-01")
+    query.add_argument("--text", type=str, help="Full-text match over description and tags")
+    query.add_argument("--limit", type=int, default=50, help="Maximum rows")
+
+    sub.add_parser("top-tags", help="Most frequent tags")
+
+    sync = sub.add_parser("sync-ratings", help="Import designer-rated images from the server")
+    sync.add_argument("--server", type=str, default=SERVER_URL, help="Server URL")
+
+    args = parser.parse_args()
+
+    configure_logging()
+
+    store = ResultsStore(args.store)
+
+    if args.command == "query":
+        start = time.perf_counter()
+        rows = store.query(tags=args.tag, min_aesthetic=args.min_aesthetic, min_priority=args.min_priority,
+                           status=args.status, since=parse_since(args.since) if args.since else None,
+                           text=args.text, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for row in rows:
+            print(f"{row['pin_id']}\taesthetic={row['aesthetic_score']}\tpriority={row['priority_score']}\t"
+                  f"status={row['process_status']}\t{', '.join(row['tags_list'][:10])}")
+        print(f"\n{len(rows)} images ({elapsed:.1f} ms)")
+
+    elif args.command == "top-tags":
+        for tag, count in store.tag_counts():
+            print(f"{count:6d}  {tag}")
+
+    elif args.command == "sync-ratings":
+        import requests
+        for rating in (1, -1):
+            response = requests.get(f"{args.server}/api/images/processed",
+                                    params={"designer_rating": rating}, timeout=30)
+            response.raise_for_status()
+            images = response.json()
+            for image in images:
+                image.setdefault("designer_rating", rating)
+            logger.info(f"Imported {store.import_server_images(images)} images with rating {rating}")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
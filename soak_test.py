@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+FashionXG Soak Test
+Runs the bridge for hours against local stub services (FashionXG server, image
+host and ComfyUI HTTP + WebSocket API, all in a child process) and fails if
+RSS, open file descriptors or threads keep growing after the warm-up period.
+
+    python soak_test.py --hours 4 --batch-size 20
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import random
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import comfy_bridge
+from logging_setup import configure_logging
+from memory_monitor import MB, MemoryMonitor, growth_per_hour
+
+logger = logging.getLogger("soak_test")
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+SAMPLE_TAGS = ["1girl", "dress", "silk", "red dress", "minimalist", "fitted", "pleats", "solo", "standing"]
+
+
+def _stub_handler(nodes: Dict[str, List[str]], batch_size: int, image_bytes: int,
+                  prompt_seconds: float, failure_rate: float):
+    """Request handler class serving the server, image and ComfyUI endpoints the bridge calls"""
+    image = os.urandom(image_bytes)
+    prompts: Dict[str, List[str]] = {}  # client_id -> queued prompt_ids
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, body: bytes, status: int = 200, content_type: str = "application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, data, status: int = 200):
+            self._send(json.dumps(data).encode('utf-8'), status)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/api/images/pending":
+                base = f"http://{self.headers['Host']}"
+                images = [{"pin_id": uuid.uuid4().hex, "image_url": f"{base}/images/{uuid.uuid4().hex}.jpg"}
+                          for _ in range(batch_size)]
+                self._json({"images": images, "total": len(images)})
+            elif path.startswith("/images/"):
+                if random.random() < failure_rate:
+                    self._json({"error": "not found"}, 404)
+                else:
+                    self._send(image, content_type="image/jpeg")
+            elif path.startswith("/history/"):
+                prompt_id = path.rsplit("/", 1)[-1]
+                outputs = {node: {"tags": [", ".join(random.sample(SAMPLE_TAGS, 5))]} for node in nodes["tags"]}
+                outputs.update({node: {"text": [f"{random.uniform(3, 9):.2f}"]} for node in nodes["score"]})
+                outputs.update({node: {"text": ["a red silk dress"]} for node in nodes["caption"]})
+                self._json({prompt_id: {"outputs": outputs}})
+            elif path == "/queue":
+                self._json({"queue_running": [], "queue_pending": []})
+            elif path == "/ws":
+                self._websocket(self.path.split("clientId=")[-1])
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            body = self._body()
+            if self.path == "/prompt":
+                prompt_id = uuid.uuid4().hex
+                with lock:
+                    prompts.setdefault(json.loads(body)["client_id"], []).append(prompt_id)
+                self._json({"prompt_id": prompt_id, "number": 0})
+            elif self.path in ("/history", "/queue", "/interrupt"):
+                self._json({})
+            elif self.path == "/api/tags/update":
+                if random.random() < failure_rate:
+                    self._json({"error": "unavailable"}, 503)
+                else:
+                    self._json({"success": True})
+            else:
+                self._json({"error": "not found"}, 404)
+
+        def _websocket(self, client_id: str):
+            """Minimal RFC 6455 server: report queued prompts as finished, then wait for the close frame"""
+            accept = base64.b64encode(hashlib.sha1(
+                (self.headers["Sec-WebSocket-Key"] + WEBSOCKET_GUID).encode()).digest()).decode()
+            self.send_response(101)
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+            self.close_connection = True
+
+            with lock:
+                queued = prompts.pop(client_id, [])
+            for prompt_id in queued:
+                time.sleep(prompt_seconds)
+                if random.random() < failure_rate:
+                    message = {"type": "execution_error",
+                               "data": {"prompt_id": prompt_id, "exception_message": "stub failure"}}
+                else:
+                    message = {"type": "executing", "data": {"node": None, "prompt_id": prompt_id}}
+                payload = json.dumps(message).encode('utf-8')
+                header = bytes([0x81, len(payload)]) if len(payload) < 126 else \
+                    bytes([0x81, 126]) + len(payload).to_bytes(2, "big")
+                self.wfile.write(header + payload)
+                self.wfile.flush()
+
+            while True:
+                head = self.rfile.read(2)
+                if len(head) < 2:
+                    return
+                opcode, length = head[0] & 0x0F, head[1] & 0x7F
+                if length == 126:
+                    length = int.from_bytes(self.rfile.read(2), "big")
+                elif length == 127:
+                    length = int.from_bytes(self.rfile.read(8), "big")
+                self.rfile.read(length + (4 if head[1] & 0x80 else 0))
+                if opcode == 0x8:
+                    self.wfile.write(b"\x88\x00")
+                    self.wfile.flush()
+                    return
+
+    return StubHandler
+
+
+def run_stub_services(ready: "multiprocessing.Queue", nodes: Dict[str, List[str]], batch_size: int,
+                      image_bytes: int, prompt_seconds: float, failure_rate: float):
+    """Child-process entry point: serve the stubs on a free port and report it"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                 _stub_handler(nodes, batch_size, image_bytes, prompt_seconds, failure_rate))
+    server.daemon_threads = True
+    # Clients drop connections mid-response (e.g. a streamed download closed on a 4xx): not a stub failure
+    server.handle_error = lambda request, client_address: None
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+
+def evaluate(samples: List[Dict], max_rss_growth: float, min_rss_growth: float,
+             max_fd_growth: int, max_thread_growth: int) -> List[str]:
+    """Failure reasons for the measured (post warm-up) samples; empty when the run is stable"""
+    failures = []
+    first, last = samples[0], samples[-1]
+
+    # A sustained slope only counts once the absolute growth is beyond allocator noise
+    rss_slope = growth_per_hour(samples, "rss") / MB
+    rss_growth = (last["rss"] - first["rss"]) / MB
+    if rss_slope > max_rss_growth and rss_growth > min_rss_growth:
+        failures.append(f"RSS grows {rss_slope:.1f} MB/h, {rss_growth:+.1f} MB since warm-up "
+                        f"(limit {max_rss_growth} MB/h)")
+
+    for key, limit in (("fds", max_fd_growth), ("sockets", max_fd_growth), ("threads", max_thread_growth)):
+        if last[key] - first[key] > limit:
+            failures.append(f"{key} grew from {first[key]} to {last[key]} (limit +{limit})")
+    return failures
+
+
+def main():
+    """Main entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Soak-test the FashionXG bridge against local stub services")
+    parser.add_argument("--hours", type=float, default=2.0, help="Total run time")
+    parser.add_argument("--warmup-minutes", type=float, default=10.0,
+                        help="Initial period excluded from growth checks (caches, pools, SQLite pages)")
+    parser.add_argument("--batch-size", type=int, default=10, help="Images per batch")
+    parser.add_argument("--pause", type=float, default=1.0, help="Seconds between batches")
+    parser.add_argument("--image-kb", type=int, default=512, help="Size of each stub image")
+    parser.add_argument("--prompt-seconds", type=float, default=0.05, help="Simulated ComfyUI time per prompt")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of downloads, prompts and uploads that fail (exercises error paths)")
+    parser.add_argument("--max-rss-growth", type=float, default=5.0, help="Allowed RSS slope in MB/hour")
+    parser.add_argument("--min-rss-growth", type=float, default=2.0,
+                        help="Total RSS growth (MB) below which a positive slope is treated as noise")
+    parser.add_argument("--max-fd-growth", type=int, default=3, help="Allowed increase in open fds and sockets")
+    parser.add_argument("--max-thread-growth", type=int, default=2, help="Allowed increase in live threads")
+    parser.add_argument("--report-minutes", type=float, default=0,
+                        help="Also log tracemalloc allocation growth this often (0 = off)")
+
+    args = parser.parse_args()
+
+    configure_logging(log_file=None, module_levels={"comfy_bridge": "WARNING", "resilience": "ERROR"})
+
+    workdir = Path(tempfile.mkdtemp(prefix="fashionxg-soak-"))
+    comfy_bridge.COMFYUI_INPUT_DIR = workdir / "comfyui_input"
+    comfy_bridge.TEMP_DIR = workdir / "temp_images"
+    comfy_bridge.STORE_PATH = str(workdir / "results.db")
+    comfy_bridge.DEAD_LETTER_FILE = str(workdir / "dead_letter.json")
+    comfy_bridge.NOTIFIER = "none"
+    comfy_bridge.KEEP_WARM_MINUTES = 0
+
+    bridge = comfy_bridge.FashionXGBridge()
+    nodes = {"tags": bridge.workflow.tags_nodes, "score": bridge.workflow.score_nodes,
+             "caption": bridge.workflow.caption_nodes}
+
+    ready = multiprocessing.Queue()
+    stubs = multiprocessing.Process(target=run_stub_services, daemon=True,
+                                    args=(ready, nodes, args.batch_size, args.image_kb * 1024,
+                                          args.prompt_seconds, args.failure_rate))
+    stubs.start()
+    stub_url = f"http://127.0.0.1:{ready.get(timeout=30)}"
+    comfy_bridge.SERVER_URL = stub_url
+    bridge.comfy_client = comfy_bridge.ComfyUIClient(stub_url)
+
+    monitor = MemoryMonitor(args.report_minutes * 60, trace=args.report_minutes > 0, max_samples=100000)
+    if args.report_minutes > 0:
+        monitor.start()
+
+    start = time.time()
+    measure_from = start + args.warmup_minutes * 60
+    deadline = start + args.hours * 3600
+    batches = images = 0
+    logger.info(f"Soak test for {args.hours:g}h against stubs at {stub_url} (work dir {workdir})")
+
+    try:
+        while time.time() < deadline:
+            images += bridge.process_batch(args.batch_size)
+            batches += 1
+            sample = monitor.sample(collect=True)
+
+            if batches % 50 == 0:
+                logger.info(f"{(time.time() - start) / 60:.0f} min: {batches} batches, {images} images, "
+                            f"RSS {sample['rss'] / MB:.1f} MB, {sample['fds']} fds, {sample['threads']} threads")
+            time.sleep(args.pause)
+    except KeyboardInterrupt:
+        logger.info("Interrupted, evaluating samples collected so far")
+    finally:
+        bridge.close()
+        monitor.stop()
+        stubs.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    measured = [s for s in monitor.samples if s["time"] >= measure_from]
+    if len(measured) < 10:
+        logger.error(f"Only {len(measured)} samples after warm-up: run longer or shorten --warmup-minutes")
+        sys.exit(2)
+
+    logger.info(f"Processed {images} images in {batches} batches; RSS {measured[0]['rss'] / MB:.1f} -> "
+                f"{measured[-1]['rss'] / MB:.1f} MB ({growth_per_hour(measured, 'rss') / MB:+.1f} MB/h), "
+                f"fds {measured[0]['fds']} -> {measured[-1]['fds']}, "
+                f"threads {measured[0]['threads']} -> {measured[-1]['threads']}")
+
+    failures = evaluate(measured, args.max_rss_growth, args.min_rss_growth, args.max_fd_growth,
+                        args.max_thread_growth)
+    for failure in failures:
+        logger.error(f"Soak test failed: {failure}")
+    if failures:
+        sys.exit(1)
+    logger.info("Soak test passed: no sustained memory, descriptor or thread growth")
+
+
+if __name__ == "__main__":
+    main()
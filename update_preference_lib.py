@@ -10,35 +10,46 @@ import requests
 from collections import Counter
 from pathlib import Path
 import logging
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from logging_setup import configure_logging
 
 # Configuration
 SERVER_URL = os.getenv("FASHIONXG_SERVER", "https://design.chermz112.xyz")
 PREFERENCE_FILE = "preference_profile.json"
+PROFILES_DIR = os.getenv("FASHIONXG_PROFILES_DIR", "profiles")
 
 # Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+logger = logging.getLogger("update_preference_lib")
 
 
 class PreferenceLibraryBuilder:
     """Build preference profile from designer feedback"""
 
-    def __init__(self, server_url: str = SERVER_URL):
+    def __init__(self, server_url: str = SERVER_URL, designer: Optional[str] = None,
+                 store_path: Optional[str] = None):
+        # The local store does not record which designer gave a rating
+        if designer and store_path:
+            raise ValueError("Per-designer profiles cannot be built from the local store")
         self.server_url = server_url
+        self.designer = designer
+        self.store_path = store_path
         self.liked_images = []
         self.disliked_images = []
 
     def fetch_feedback_data(self) -> Dict:
-        """Fetch all images with designer ratings from server"""
+        """Fetch all images with designer ratings from server (or the local store)"""
+        if self.store_path:
+            return self.load_local_feedback_data()
+
         try:
+            # Restrict to one designer's ratings when building a named profile
+            designer_params = {"designer": self.designer} if self.designer else {}
+
             # Fetch liked images (designer_rating = 1)
             response_liked = requests.get(
                 f"{self.server_url}/api/images/processed",
-                params={"designer_rating": 1},
+                params={"designer_rating": 1, **designer_params},
                 timeout=30
             )
             response_liked.raise_for_status()
@@ -47,13 +58,16 @@ class PreferenceLibraryBuilder:
             # Fetch disliked images (designer_rating = -1)
             response_disliked = requests.get(
                 f"{self.server_url}/api/images/processed",
-                params={"designer_rating": -1},
+                params={"designer_rating": -1, **designer_params},
                 timeout=30
             )
             response_disliked.raise_for_status()
             self.disliked_images = response_disliked.json()
 
-            logger.info(f"Fetched {len(self.liked_images)} liked and {len(self.disliked_images)} disliked images")
+            logger.info(f"Fetched {len(self.liked_images)} liked and {len(self.disliked_images)} disliked images"
+                        f"{f' for {self.designer}' if self.designer else ''}")
+            if self.designer:
+                self.check_designer_filter()
             return {
                 "liked": self.liked_images,
                 "disliked": self.disliked_images
@@ -63,6 +77,44 @@ class PreferenceLibraryBuilder:
             logger.error(f"Failed to fetch feedback data: {e}")
             return {"liked": [], "disliked": []}
 
+    def check_designer_filter(self):
+        """
+        Warn when the server seems to ignore the `designer` parameter (it is not a
+        documented filter): the named profile would then copy the global one
+        """
+        try:
+            response = requests.get(f"{self.server_url}/api/images/processed",
+                                    params={"designer_rating": 1}, timeout=30)
+            response.raise_for_status()
+            all_liked = {image.get("pin_id") for image in response.json()}
+        except Exception as e:
+            logger.warning(f"Could not check the designer filter: {e}")
+            return
+        designer_liked = {image.get("pin_id") for image in self.liked_images}
+
+        if designer_liked and designer_liked == all_liked:
+            logger.warning(f"Server returned the same liked images for designer {self.designer} as for all "
+                           f"designers: it may ignore the designer filter, making this profile a copy of the "
+                           f"global one")
+
+    def load_local_feedback_data(self) -> Dict:
+        """Read rated images from the local results store instead of the server"""
+        from results_store import ResultsStore
+
+        store = ResultsStore(self.store_path)
+        try:
+            self.liked_images = store.rated_images(1)
+            self.disliked_images = store.rated_images(-1)
+        finally:
+            store.close()
+
+        logger.info(f"Loaded {len(self.liked_images)} liked and {len(self.disliked_images)} disliked images "
+                    f"from {self.store_path}")
+        return {
+            "liked": self.liked_images,
+            "disliked": self.disliked_images
+        }
+
     def extract_tag_frequencies(self, images: List[Dict]) -> Dict[str, int]:
         """Extract and count tag frequencies from images"""
         tag_counter = Counter()
@@ -98,21 +150,30 @@ class PreferenceLibraryBuilder:
         return dict(tag_counter)
 
     def extract_clip_vectors(self, images: List[Dict]) -> List[List[float]]:
-        """Extract CLIP vectors from images (if available)"""
+        """Extract CLIP vectors from images (if available), falling back to the clip_backfill cache"""
+        from clip_backfill import load_cache
+
+        cache = load_cache()
         vectors = []
 
         for image in images:
             # Check if image has CLIP vector stored
             vector = image.get("clip_vector")
+            if isinstance(vector, str):
+                try:
+                    vector = json.loads(vector)
+                except:
+                    vector = None
+            if not vector and cache and image.get("pin_id"):
+                cached = cache.get_pin(image["pin_id"])
+                vector = cached.tolist() if cached is not None else None
             if vector:
-                if isinstance(vector, str):
-                    try:
-                        vector = json.loads(vector)
-                    except:
-                        continue
                 vectors.append(vector)
 
         logger.info(f"Extracted {len(vectors)} CLIP vectors")
+        if len(vectors) < len(images):
+            logger.warning(f"{len(images) - len(vectors)} images have no CLIP vector, "
+                           f"run clip_backfill.py to embed them")
         return vectors
 
     def build_preference_profile(self) -> Dict:
@@ -129,7 +190,8 @@ class PreferenceLibraryBuilder:
                 "disliked_tag_frequencies": {},
                 "liked_vectors": [],
                 "total_liked": 0,
-                "total_disliked": 0
+                "total_disliked": 0,
+                "designer": self.designer
             }
 
         # Extract tag frequencies
@@ -152,26 +214,29 @@ class PreferenceLibraryBuilder:
             "liked_vectors": liked_vectors,
             "total_liked": len(feedback_data["liked"]),
             "total_disliked": len(feedback_data["disliked"]),
+            "designer": self.designer,
             "updated_at": None  # Will be set when saving
         }
 
         return profile
 
-    def save_profile(self, profile: Dict):
+    def save_profile(self, profile: Dict, output_file: Optional[str] = None):
         """Save preference profile to file"""
         from datetime import datetime
 
+        output_file = output_file or PREFERENCE_FILE
         profile["updated_at"] = datetime.now().isoformat()
 
-        with open(PREFERENCE_FILE, 'w') as f:
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, 'w') as f:
             json.dump(profile, f, indent=2)
 
-        logger.info(f"Saved preference profile to {PREFERENCE_FILE}")
+        logger.info(f"Saved preference profile to {output_file}")
 
     def print_summary(self, profile: Dict):
         """Print summary of preference profile"""
         print("\n" + "="*60)
-        print("PREFERENCE PROFILE SUMMARY")
+        print("PREFERENCE PROFILE SUMMARY" + (f" ({profile['designer']})" if profile.get("designer") else ""))
         print("="*60)
         print(f"Total Liked Images: {profile['total_liked']}")
         print(f"Total Disliked Images: {profile['total_disliked']}")
@@ -192,27 +257,45 @@ class PreferenceLibraryBuilder:
 def main():
     """Main entry point"""
     import argparse
+    global SERVER_URL, PREFERENCE_FILE
 
     parser = argparse.ArgumentParser(description="Update FashionXG Preference Library")
     parser.add_argument("--server", type=str, default=SERVER_URL, help="Server URL")
     parser.add_argument("--output", type=str, default=PREFERENCE_FILE, help="Output file path")
+    parser.add_argument("--designer", action="append", default=[],
+                        help="Build a named profile from this designer's ratings into --profiles-dir (repeatable)")
+    parser.add_argument("--profiles-dir", type=str, default=PROFILES_DIR,
+                        help="Directory for per-designer profiles")
+    parser.add_argument("--store", type=str, default=None,
+                        help="Build from the local results store (see results_store.py sync-ratings)")
 
     args = parser.parse_args()
+    if args.designer and args.store:
+        parser.error("--designer needs the server's per-designer ratings and cannot be used with --store")
+
+    configure_logging()
 
     # Update global config
-    global SERVER_URL, PREFERENCE_FILE
     SERVER_URL = args.server
     PREFERENCE_FILE = args.output
 
-    # Build preference library
-    builder = PreferenceLibraryBuilder(SERVER_URL)
-    profile = builder.build_preference_profile()
-
-    # Save profile
-    builder.save_profile(profile)
-
-    # Print summary
-    builder.print_summary(profile)
+    if args.designer:
+        # One named profile per designer, loaded together by the bridge
+        for designer in args.designer:
+            builder = PreferenceLibraryBuilder(SERVER_URL, designer=designer, store_path=args.store)
+            profile = builder.build_preference_profile()
+            builder.save_profile(profile, str(Path(args.profiles_dir) / f"{designer}.json"))
+            builder.print_summary(profile)
+    else:
+        # Build preference library
+        builder = PreferenceLibraryBuilder(SERVER_URL, store_path=args.store)
+        profile = builder.build_preference_profile()
+
+        # Save profile
+        builder.save_profile(profile)
+
+        # Print summary
+        builder.print_summary(profile)
 
     logger.info("Preference library update complete!")
 